@@ -1,13 +1,33 @@
 import os
 import sys
 import json
+import html
+import time
 import uuid
 import spacy
+import hashlib
 import argparse
 import subprocess
+from bisect import bisect_left
 import regex as re
+from pathlib import Path
+from functools import lru_cache
+from contextlib import contextmanager, nullcontext, ExitStack
+from collections import OrderedDict
+from html.parser import HTMLParser
 from pypinyin import lazy_pinyin
 from bs4 import BeautifulSoup, Comment, NavigableString
+from bs4.builder import builder_registry
+from spacy.language import Language
+from ngram_langid import identify_languages
+from segment_cache import SegmentCache, cache_key, DEFAULT_MAX_MB
+from artifact_format import ArtifactWriter
+from step_profile import PhaseProfiler, DEFAULT_TOP_BLOCKS
+
+try:
+    import orjson
+except ImportError:  # --json-format fast falls back to the compact stdlib encoder
+    orjson = None
 
 
 SPACY_MODELS = {
@@ -37,6 +57,7 @@ TRANSLATABLE_ATTRS = {
     "data-i18n", "data-caption", "data-title", "data-tooltip",
     "data-label", "data-error"
 }
+_ATTR_RANK = {attr: rank for rank, attr in enumerate(TRANSLATABLE_ATTRS)}
 
 SEO_META_FIELDS = {
     "name": {
@@ -70,6 +91,100 @@ JSONLD_EXCLUDE_KEYS = {
 EXCLUDED_META_NAMES = {"viewport"}
 EXCLUDED_META_PROPERTIES = {"og:url"}
 
+# spaCy model pool: every pipeline is loaded once per process and reused.
+MODEL_POOL_SIZE = 4      # max pipelines kept in memory (least recently used is dropped)
+DISABLED_PIPES = ()      # pipes excluded at load time, e.g. ("ner", "lemmatizer")
+_model_pool = OrderedDict()
+NLP_BATCH_SIZE = 256     # texts per nlp.pipe batch
+_segment_cache = None    # optional on-disk SegmentCache, see configure_segment_cache
+_profiler = None         # PhaseProfiler while --profile is on, see configure_profiler
+
+# Functions timed as a profiling phase once configure_profiler() wraps them
+PROFILED_FUNCTIONS = {
+    "is_translatable_text": "filter",
+    "is_translatable_string": "filter",
+    "detect_block_languages": "language_detection",
+    "load_spacy_model": "model_loading",
+    "token_pinyin": "pinyin",
+    "collect_jsonld_blocks": "jsonld",
+}
+DEFAULT_PROFILE_FILE = "step1_profile.json"
+
+# Sentence segmentation engines, most accurate and slowest first:
+#   parser      - the dependency parser of the full pipeline
+#   senter      - the pipeline's statistical sentence recognizer, parser not loaded
+#   sentencizer - spaCy's punctuation rules
+#   regex       - SENTENCE_END_PATTERN over the raw text
+# Run benchmark_segmenters.py to compare speed and boundary agreement per language.
+SEGMENTERS = ("parser", "senter", "sentencizer", "regex")
+SEGMENTER = "parser"     # default engine
+LANG_SEGMENTERS = {}     # per-language overrides, e.g. {"en": "sentencizer"}
+SENTENCE_PIPES = ("parser", "senter", "sentencizer", "regex_sentencizer")
+RULE_SENTENCE_PIPES = ("sentencizer", "regex_sentencizer")
+EMBEDDING_PIPES = ("tok2vec", "transformer")
+SENTENCE_END_PATTERN = re.compile(r'''
+    (?<!\b(?:\p{L}|Prof|Dr|Mr|Mrs|Ms|St|Jr|Sr|vs|ca|etc|Ed|No|Fig|Vol|pp))  # initials, abbreviations
+    [.!?…]+['"”’)\]]*(?=\s+[^\p{Ll}\s])   # Latin punctuation, then a word not in lowercase
+    |[。！？]+['"”’」』）)\]]*              # CJK punctuation needs no space
+''', re.VERBOSE)
+
+# Language detectors for routing blocks to spaCy models:
+#   script - script ranges, accents and stop words (classify_language)
+#   ngram  - character n-gram profiles (ngram_langid), script ranges for non-profiled scripts
+LANG_DETECTORS = ("script", "ngram")
+
+# Output granularity:
+#   word     - sentences plus per-token records (pos, entity, language, pinyin)
+#   sentence - sentences only; the word-level pipes are not loaded
+GRANULARITIES = ("word", "sentence")
+DEFAULT_GRANULARITY = "word"
+WORD_LEVEL_PIPES = ("tagger", "morphologizer", "attribute_ruler", "lemmatizer", "ner")
+
+# translatable_structured output: pretty-printed JSON, or the compact columnar
+# format of artifact_format.py (python artifact_format.py to-json converts back)
+STRUCTURED_FILES = {
+    "json": "translatable_structured.json",
+    "packed": "translatable_structured.pack"
+}
+DEFAULT_STRUCTURED_FORMAT = "json"
+
+# Step 1 artifacts, selectable with --outputs
+OUTPUTS = ("flat", "structured", "sentences", "html")
+OUTPUT_FILES = {
+    "flat": "translatable_flat.json",
+    "sentences": "translatable_flat_sentences.json",
+    "html": "non_translatable.html"
+}
+# Block ids: sequential BLOCK_1, BLOCK_2... or stable BLOCK_<hash of DOM path, header and text>,
+# which survive edits elsewhere on the page (needed for --incremental manifests)
+BLOCK_ID_SCHEMES = ("sequential", "stable")
+STABLE_ID_LENGTH = 12    # hex digits of the sha1
+MANIFEST_VERSION = 1
+
+# pretty: json.dump(indent=2) layout; fast: compact, orjson when installed
+JSON_FORMATS = ("pretty", "fast")
+DEFAULT_JSON_FORMAT = "pretty"
+
+PINYIN_CACHE_SIZE = 50000  # distinct token strings whose pinyin is memoized
+
+# Short UI strings ("Home", "EN", "Read more") skip the pipeline and are
+# tokenized only, unless word-level pos/entity output is requested.
+SHORT_TEXT_MAX_WORDS = 4
+SENTENCE_PUNCTUATION = re.compile(r'[.!?…。！？]')
+
+INHERIT = object()  # is_translatable_text: look the translate value up from the ancestors
+
+# Math detection patterns
+MATH_CLASSES = ('math', 'equation', 'formula')
+LATEX_PATTERN = re.compile(r'\$.*?\$|\\\(.*?\\\)')
+MATH_DELIMITER_CHARS = frozenset("$\\()\n")  # see forget_math_context
+EQUATION_PATTERN = re.compile(r'''
+    (\w+\s*[=+\-*/^]\s*\S+)|  # Equations like "x = y+1"
+    (\d+[\+\-\*/]\d+)|         # Arithmetic "2+3"
+    ([a-zA-Z]+\^?\d+)|         # Exponents "x²"
+    (\$.*?\$|\\\(.*?\\\))      # LaTeX "$E=mc^2$"
+''', re.VERBOSE)
+
 
 # Helper Functions -------------------------------------------------
 def is_pure_symbol(text):
@@ -91,6 +206,109 @@ def is_symbol_heavy(text):
     symbol_count = len(re.findall(r'[\p{P}\p{S}\d_]', text))
     return symbol_count > 0  # treat as symbol-heavy if only symbols
 
+# Script classifier ------------------------------------------------
+# One pass over the distinct characters and words of a string replaces the
+# chain of contains_* regex searches. Each table entry is a bitmask of the
+# features it signals; the detection order below resolves the final code.
+_ZH, _AR, _CY, _EL, _HE, _TH, _DEVA, _FR, _ES, _IT, _DE, _EN = (1 << i for i in range(12))
+
+_SCRIPT_RANGES = (
+    (0x4E00, 0x9FFF, _ZH),
+    (0x0600, 0x06FF, _AR),
+    (0x0400, 0x04FF, _CY),
+    (0x0370, 0x03FF, _EL),
+    (0x0590, 0x05FF, _HE),
+    (0x0E00, 0x0E7F, _TH),
+    (0x0900, 0x097F, _DEVA),
+)
+
+_ACCENT_CHARS = (
+    ("àâæçéèêëîïôœùûüÿ", _FR),
+    ("áéíóúüñ", _ES),
+    ("àèéìíîòóùú", _IT),
+    ("äöüß", _DE),
+)
+
+_STOP_WORDS = (
+    ("le la les un une des ce cette est avec mais pour pas qui sur", _FR),
+    ("el la los las un una que es con pero por para cómo sin más", _ES),
+    ("il lo la gli le un una che è con ma come perché senza più meno", _IT),
+    ("der die das ein eine ist mit aber und nicht für ohne warum wie mehr", _DE),
+    ("the and is of to in with but not a an for on that how without more", _EN),
+)
+
+
+def _build_char_features():
+    table = {}
+    for start, end, bit in _SCRIPT_RANGES:
+        for code in range(start, end + 1):
+            table[chr(code)] = table.get(chr(code), 0) | bit
+    for chars, bit in _ACCENT_CHARS:
+        for ch in chars:
+            for variant in {ch, ch.upper()}:
+                if len(variant) == 1:
+                    table[variant] = table.get(variant, 0) | bit
+    return table
+
+
+def _build_word_features():
+    table = {}
+    for words, bit in _STOP_WORDS:
+        for word in words.split():
+            table[word] = table.get(word, 0) | bit
+    return table
+
+
+_CHAR_FEATURES = _build_char_features()
+_WORD_FEATURES = _build_word_features()
+_WORD_RE = re.compile(r'\w+')
+_CASE_FOLD = str.maketrans({"ſ": "s", "İ": "i"})  # matched case-insensitively by regex, missed by str.lower
+_WORD_BITS = _FR | _ES | _IT | _DE | _EN
+
+# (code, features) in priority order, mirroring the former if/elif chains
+_DETECT_ORDER = (
+    ("zh", _ZH), ("en", _EN), ("xx", _AR), ("ru", _CY), ("el", _EL),
+    ("xx", _HE), ("xx", _TH), ("xx", _DEVA),
+    ("fr", _FR), ("es", _ES), ("it", _IT), ("de", _DE),
+)
+_EXCEPTION_ORDER = (("zh", _ZH), ("xx", _AR | _HE | _TH | _DEVA))
+
+
+def script_features(text, words=True):
+    """Return the feature bitmask of text (script ranges, accents and, optionally, stop words)."""
+    mask = 0
+    char_features = _CHAR_FEATURES
+    for ch in set(text):
+        mask |= char_features.get(ch, 0)
+    if words:
+        word_features = _WORD_FEATURES
+        for word in set(_WORD_RE.findall(text)):
+            mask |= word_features.get(word.translate(_CASE_FOLD).lower(), 0)
+    return mask
+
+
+def classify_language(text, exception_only=False):
+    """
+    Classify text by script and stop words in a single pass.
+
+    With exception_only, only scripts that need a non-default model are
+    considered (the is_exception_language rules); otherwise the full
+    detectis_exception_language rules apply. Returns a language code or None.
+    """
+    order = _EXCEPTION_ORDER if exception_only else _DETECT_ORDER
+    mask = script_features(text, words=not exception_only)
+    if mask:
+        for code, bits in order:
+            if mask & bits:
+                return code
+    return None
+
+
+def classify_languages(texts, exception_only=False):
+    """Batch form of classify_language: one code (or None) per input string."""
+    return [classify_language(text, exception_only) for text in texts]
+
+
 def is_exception_language(text):
     """
     Detect if the text contains a script or pattern matching a non-default language.
@@ -99,17 +317,7 @@ def is_exception_language(text):
         A language code (e.g. 'zh', 'fr', 'ru', 'xx') if a match is found.
         Returns None if no exception language is detected.
     """
-    if contains_chinese(text):
-        return "zh"
-    elif contains_arabic(text):
-        return "xx"
-    elif contains_hebrew(text):
-        return "xx"
-    elif contains_thai(text):
-        return "xx"
-    elif contains_devanagari(text):
-        return "xx"
-    return None
+    return classify_language(text, exception_only=True)
 
 def detectis_exception_language(text):
     """
@@ -119,92 +327,268 @@ def detectis_exception_language(text):
         A language code (e.g. 'zh', 'fr', 'ru', 'xx') if a match is found.
         Returns None if no exception language is detected.
     """
-    if contains_chinese(text):
-        return "zh"
-    elif contains_english(text):
-        return "en"
-    elif contains_arabic(text):
-        return "xx"
-    elif contains_cyrillic(text):
-        return "ru"
-    elif contains_greek(text):
-        return "el"
-    elif contains_hebrew(text):
-        return "xx"
-    elif contains_thai(text):
-        return "xx"
-    elif contains_devanagari(text):
-        return "xx"
-    elif contains_french(text):
-        return "fr"
-    elif contains_spanish(text):
-        return "es"
-    elif contains_italian(text):
-        return "it"
-    elif contains_german(text):
-        return "de"
-    return None
+    return classify_language(text)
 
 
 def has_real_words(text):
     return re.search(r'\b\p{L}{3,}\b', text, re.UNICODE) is not None
 
-def has_math_html_markup(element):
-    """Check for math-specific HTML markup (MathML, LaTeX, etc.)."""
+def has_math_html_markup(element, math_cache=None):
+    """
+    Check for math-specific HTML markup (MathML, LaTeX, etc.).
+
+    The answer only depends on the parent element, so when a math_cache dict is
+    given it is computed once per parent; forget_math_context drops the entries
+    a text replacement invalidates.
+    """
     parent = element.parent
-    return (
-        parent.name == 'math' or 
-        re.search(r'\$.*?\$|\\\(.*?\\\)', parent.text or '') or
-        any(cls in parent.get('class', []) for cls in ['math', 'equation', 'formula'])
+    if math_cache is not None:
+        cached = math_cache.get(id(parent))
+        if cached is not None:
+            return cached
+
+    is_math = bool(
+        parent.name == 'math' or
+        any(cls in parent.get('class', []) for cls in MATH_CLASSES) or
+        LATEX_PATTERN.search(parent.text or '')
     )
+    if math_cache is not None:
+        math_cache[id(parent)] = is_math
+    return is_math
+
+def forget_math_context(element, math_cache):
+    """
+    Drop the cached math context of element's ancestors before it is replaced.
+
+    A LATEX_PATTERN match in an ancestor's text can only appear or vanish when
+    the replaced text holds a delimiter character or a newline, so most
+    replacements keep the cache.
+    """
+    if MATH_DELIMITER_CHARS.isdisjoint(element):
+        return
+    for ancestor in element.parents:
+        math_cache.pop(id(ancestor), None)
 
 def is_math_fragment(text):
     """Check if text is a math formula without lexical words."""
-    equation_pattern = r'''
-        (\w+\s*[=+\-*/^]\s*\S+)|  # Equations like "x = y+1"
-        (\d+[\+\-\*/]\d+)|         # Arithmetic "2+3"
-        ([a-zA-Z]+\^?\d+)|         # Exponents "x²"
-        (\$.*?\$|\\\(.*?\\\))      # LaTeX "$E=mc^2$"
-    '''
-    has_math = re.search(equation_pattern, text, re.VERBOSE)
+    has_math = EQUATION_PATTERN.search(text)
     return (has_math and not has_real_words(text)) or is_symbol_heavy(text)  # <-- Fixed line continuation
 
 
-def load_spacy_model(lang_code):
+@Language.component("regex_sentencizer")
+def regex_sentencizer(doc):
+    """Start a sentence at the first token after every SENTENCE_END_PATTERN match."""
+    token_starts = [token.idx for token in doc]
+    starts = {bisect_left(token_starts, match.end()) for match in SENTENCE_END_PATTERN.finditer(doc.text)}
+    for i, token in enumerate(doc):
+        token.is_sent_start = i == 0 or i in starts
+    return doc
+
+
+def parse_segmenter_spec(spec):
+    """
+    Parse "engine", "lang=engine,..." or a mix into (default engine or None, {lang: engine}).
+
+    Example: "sentencizer,fr=parser" uses the sentencizer for every language but French.
+    """
+    default, by_lang = None, {}
+    for item in (part.strip() for part in spec.split(",")):
+        if not item:
+            continue
+        lang, _, engine = item.rpartition("=")
+        lang, engine = lang.strip(), engine.strip()
+        if engine not in SEGMENTERS:
+            raise ValueError(f"Unknown segmenter '{engine}'. Choose from: {', '.join(SEGMENTERS)}.")
+        if not lang:
+            default = engine
+        elif lang not in SPACY_MODELS:
+            raise ValueError(f"Unsupported language '{lang}' in segmenter spec. Choose from: {', '.join(SPACY_MODELS)}.")
+        else:
+            by_lang[lang] = engine
+    return default, by_lang
+
+
+def segmenter_for(lang_code):
+    return LANG_SEGMENTERS.get(lang_code, SEGMENTER)
+
+
+def configure_model_pool(max_models=None, disable=None, segmenter=None):
+    """
+    Set the pool size, the pipes excluded from newly loaded models and the sentence segmenter.
+
+    segmenter is an engine name, a {lang: engine} mapping or a spec string
+    (see parse_segmenter_spec); it replaces the previous segmenter settings.
+    """
+    global MODEL_POOL_SIZE, DISABLED_PIPES, SEGMENTER, LANG_SEGMENTERS
+    if max_models is not None:
+        MODEL_POOL_SIZE = max(1, int(max_models))
+    if disable is not None:
+        DISABLED_PIPES = tuple(sorted(set(disable)))
+    if segmenter is not None:
+        if isinstance(segmenter, dict):
+            default, by_lang = None, {}
+            for lang, engine in segmenter.items():
+                by_lang.update(parse_segmenter_spec(f"{lang}={engine}")[1])
+        else:
+            default, by_lang = parse_segmenter_spec(segmenter)
+        SEGMENTER = default or "parser"
+        LANG_SEGMENTERS = by_lang
+    while len(_model_pool) > MODEL_POOL_SIZE:
+        _model_pool.popitem(last=False)
+
+
+def excluded_pipes(granularity=DEFAULT_GRANULARITY):
+    """Pipes left out at load time: DISABLED_PIPES, plus the word-level pipes in sentence mode."""
+    if granularity == "sentence":
+        return tuple(sorted(set(DISABLED_PIPES) | set(WORD_LEVEL_PIPES)))
+    return DISABLED_PIPES
+
+
+def load_spacy_model(lang_code, granularity=DEFAULT_GRANULARITY):
+    """Return a warm spaCy pipeline for lang_code, loading it at most once."""
     if lang_code not in SPACY_MODELS:
         print(f"Unsupported language '{lang_code}'. Choose from: {', '.join(SPACY_MODELS)}.")
         sys.exit(1)
 
+    disabled = excluded_pipes(granularity)
+    segmenter = segmenter_for(lang_code)
+    pool_key = (lang_code, disabled, segmenter)
+    nlp = _model_pool.get(pool_key)
+    if nlp is not None:
+        _model_pool.move_to_end(pool_key)
+        return nlp
+
     model_name = SPACY_MODELS[lang_code]
+    exclude = set(disabled)
+    if segmenter != "parser":
+        exclude.add("parser")
+    if segmenter in ("sentencizer", "regex"):
+        exclude.add("senter")
 
     try:
-        nlp = spacy.load(model_name)
+        nlp = spacy.load(model_name, exclude=sorted(exclude))
     except OSError:
         print(f"spaCy model '{model_name}' not found. Downloading automatically...")
         subprocess.run(["python", "-m", "spacy", "download", model_name], check=True)
-        nlp = spacy.load(model_name)
+        nlp = spacy.load(model_name, exclude=sorted(exclude))
+
+    add_sentence_segmenter(nlp, segmenter)
+
+    _model_pool[pool_key] = nlp
+    while len(_model_pool) > MODEL_POOL_SIZE:
+        _model_pool.popitem(last=False)
+    return nlp
+
+
+def configure_segment_cache(path=None, max_mb=DEFAULT_MAX_MB):
+    """Open the persistent segmentation cache at path, or turn caching off with None."""
+    global _segment_cache
+    if _segment_cache is not None:
+        _segment_cache.close()
+    _segment_cache = SegmentCache(path, max_mb) if path else None
+    return _segment_cache
+
+
+def report_segment_cache():
+    if _segment_cache is not None:
+        stats = _segment_cache.stats()
+        print(f"♻️ Segmentation cache: {stats['hits']} hits, {stats['misses']} misses "
+              f"({stats['hit_rate']:.0%} hit rate, {stats['evictions']} evicted)")
+
+
+def configure_profiler(top_blocks=DEFAULT_TOP_BLOCKS, trace_memory=False):
+    """
+    Turn on per-phase profiling (see step_profile).
+
+    The functions in PROFILED_FUNCTIONS are replaced by timed wrappers, so a run
+    without --profile pays nothing for it.
+    """
+    global _profiler
+    if _profiler is None:
+        _profiler = PhaseProfiler(top_blocks, trace_memory)
+        for name, phase in PROFILED_FUNCTIONS.items():
+            globals()[name] = _profiler.wrap(globals()[name], phase)
+    return _profiler
+
+
+def profile_phase(name):
+    return _profiler.phase(name) if _profiler is not None else nullcontext()
+
+
+def model_fingerprint(nlp):
+    """Identify a loaded pipeline for cache keys: model, version and active pipes."""
+    meta = nlp.meta
+    return f"{meta.get('lang')}_{meta.get('name')}@{meta.get('version')}:{'+'.join(nlp.pipe_names)}"
+
+
+def add_sentence_segmenter(nlp, segmenter):
+    """Make sure nlp sets sentence boundaries with the given engine (see SEGMENTERS)."""
+    if segmenter == "regex":
+        nlp.add_pipe("regex_sentencizer", first=True)
+    elif segmenter == "senter" and "senter" in nlp.disabled:
+        nlp.enable_pipe("senter")
 
     # Minimal addition: ensure sentence segmentation
-    if "parser" not in nlp.pipe_names and "sentencizer" not in nlp.pipe_names:
+    if not any(name in nlp.pipe_names for name in SENTENCE_PIPES):
         nlp.add_pipe("sentencizer", first=True)
 
-    return nlp
+    # With only rule-based pipes left, nothing listens to the shared embedding layer
+    if all(name in EMBEDDING_PIPES or name in RULE_SENTENCE_PIPES for name in nlp.pipe_names):
+        for name in EMBEDDING_PIPES:
+            if name in nlp.pipe_names:
+                nlp.remove_pipe(name)
 
-def is_translatable_text(tag):
-    """Determine if the given tag's text should be translated."""
-    # Check translate attribute inheritance hierarchy
-    current_element = tag.parent
-    translate_override = None
-    
+
+def preload_spacy_models(*lang_codes, granularity=DEFAULT_GRANULARITY):
+    """Eagerly load the models for the given languages (None entries are ignored)."""
+    for lang_code in lang_codes:
+        if lang_code:
+            load_spacy_model(lang_code, granularity)
+
+
+def translate_state(element):
+    """Return the closest explicit translate value ("yes"/"no") from element upwards, or None."""
+    current_element = element
     while current_element is not None:
         current_translate = current_element.get("translate", "").lower()
         if current_translate in {"yes", "no"}:
-            translate_override = current_translate
-            break  # Closest explicit declaration wins
+            return current_translate  # Closest explicit declaration wins
         current_element = current_element.parent
+    return None
+
+
+def iter_nodes_with_translate(root):
+    """
+    Yield (node, translate_override) for every tag and string under root in document order.
+
+    For a string the override is the value inherited from its parent; for a tag
+    it is the value in effect for the tag itself (its own or the inherited one).
+    The inherited value is carried down a single pre-order traversal, so no
+    node needs to walk its ancestors.
+    """
+    stack = [(child, translate_state(root)) for child in reversed(root.contents)]
+    while stack:
+        node, inherited = stack.pop()
+        if isinstance(node, NavigableString):
+            yield node, inherited
+            continue
+        current_translate = node.get("translate", "").lower()
+        if current_translate not in {"yes", "no"}:
+            current_translate = inherited
+        yield node, current_translate
+        stack.extend((child, current_translate) for child in reversed(node.contents))
+
+
+def is_translatable_string(text, parent_tag, translate_override, has_math_markup, is_comment=False):
+    """
+    Apply the translatability rules to a stripped text in its context.
+
+    has_math_markup is a zero-argument callable, only evaluated when needed.
+    """
+    # If any parent says "no", block translation
+    if translate_override == "no":
+        return False
 
-    # Check text content after parent checks
-    text = tag.strip()
     if not text:
         return False
 
@@ -213,19 +597,14 @@ def is_translatable_text(tag):
     and (
         is_pure_symbol(text) or 
         is_math_fragment(text) or 
-        has_math_html_markup(tag))):
-        return False
-
-    # If any parent says "no", block translation
-    if translate_override == "no":
+        has_math_markup())):
         return False
 
     # If no explicit "yes", check default translatability
-    parent_tag = tag.parent.name if tag.parent else None
     default_translatable = (
         parent_tag in TRANSLATABLE_TAGS and
         parent_tag not in SKIP_PARENTS and
-        not isinstance(tag, Comment))
+        not is_comment)
     # Explicit "yes" overrides default logic
     if translate_override == "yes":
         return True  # Force allow if parent says "yes"
@@ -233,6 +612,63 @@ def is_translatable_text(tag):
     return default_translatable
 
 
+def is_translatable_text(tag, translate_override=INHERIT, math_cache=None):
+    """
+    Determine if the given tag's text should be translated.
+
+    translate_override is the inherited translate value when the caller already
+    knows it (see iter_nodes_with_translate); otherwise the ancestors are walked.
+    math_cache is passed on to has_math_html_markup.
+    """
+    if translate_override is INHERIT:
+        translate_override = translate_state(tag.parent) if tag.parent else None
+
+    return is_translatable_string(
+        tag.strip(),
+        tag.parent.name if tag.parent else None,
+        translate_override,
+        lambda: has_math_html_markup(tag, math_cache),
+        isinstance(tag, Comment)
+    )
+
+
+def translatable_attrs(attrs):
+    """
+    Yield (attr, stripped value) for the translatable attributes of a tag's attrs.
+
+    Only the attributes present are looked at; they come out in
+    TRANSLATABLE_ATTRS iteration order, which fixes the BLOCK_N numbering.
+    """
+    present = [
+        attr for attr in attrs
+        if attr in TRANSLATABLE_ATTRS and attr not in BLOCKED_ATTRS
+    ]
+    if len(present) > 1:
+        present.sort(key=_ATTR_RANK.__getitem__)
+    for attr in present:
+        if isinstance(attrs[attr], str):
+            value = attrs[attr].strip()
+            if value:
+                yield attr, value
+
+
+def seo_meta_key(attrs):
+    """Return the meta name/property whose content should be translated, or None."""
+    name = (attrs.get("name") or "").lower()
+    prop = (attrs.get("property") or "").lower()
+    content = (attrs.get("content") or "").strip()
+
+    if name in EXCLUDED_META_NAMES or prop in EXCLUDED_META_PROPERTIES:
+        return None
+
+    if content and (
+        (name and name in SEO_META_FIELDS["name"]) or
+        (prop and prop in SEO_META_FIELDS["property"])
+    ):
+        return name or prop
+    return None
+
+
 
 def contains_chinese(text):
     return re.search(r'[\u4e00-\u9fff]', text) is not None
@@ -290,23 +726,30 @@ def contains_english(text):
         re.search(r'\b(the|and|is|of|to|in|with|but|not|a|an|for|on|that|how|without|more)\b', text, re.IGNORECASE) is not None
     )
 
-def process_text_block(block_id, text, default_nlp):
-    lang_code = detectis_exception_language(text)
-    nlp = default_nlp if not lang_code else load_spacy_model(lang_code)
-    detected_language = lang_code or "default"
-    
+def build_block_records(block_id, doc, detected_language, granularity=DEFAULT_GRANULARITY):
+    """
+    Turn a parsed Doc into the (structured, flattened, sentence_tokens) triple.
+
+    With granularity="sentence" only the S-level entries are built.
+    """
+    with_words = granularity == "word"
     structured = {}
     flattened = {}
     sentence_tokens = []
 
-    doc = nlp(text)
     for s_idx, sent in enumerate(doc.sents, 1):
         s_key = f"S{s_idx}"
         sentence_id = f"{block_id}_{s_key}"
         sentence_text = sent.text
         flattened[sentence_id] = sentence_text
-        structured[s_key] = {"text": sentence_text, "words": {}}
         sentence_tokens.append((sentence_id, sentence_text))
+        if not with_words:
+            structured[s_key] = {"text": sentence_text}
+            continue
+
+        structured[s_key] = {"text": sentence_text, "words": {}}
+        # Only sentences with Chinese characters can have tokens that need pinyin
+        sentence_has_chinese = contains_chinese(sentence_text)
 
         for w_idx, token in enumerate(sent, 1):
             w_key = f"W{w_idx}"
@@ -317,17 +760,160 @@ def process_text_block(block_id, text, default_nlp):
                "pos": token.pos_,
                "language": detected_language,
                "ent": token.ent_type_ or None,
-               "pinyin": (
-                  " ".join(lazy_pinyin(token.text)) 
-                  if contains_chinese(token.text) 
-                  else None
-               )
+               "pinyin": token_pinyin(token.text) if sentence_has_chinese else None
             }
 
     return structured, flattened, sentence_tokens
 
 
-def extract_from_jsonld(obj, block_counter, nlp, structured_output, flattened_output):
+@lru_cache(maxsize=PINYIN_CACHE_SIZE)
+def token_pinyin(text):
+    """Space-separated pinyin of a token, or None without Chinese characters (memoized)."""
+    return " ".join(lazy_pinyin(text)) if contains_chinese(text) else None
+
+
+def is_short_text(text):
+    """True for a few words without sentence punctuation: always a single sentence."""
+    return len(text.split()) <= SHORT_TEXT_MAX_WORDS and not SENTENCE_PUNCTUATION.search(text)
+
+
+def needs_word_analysis(nlp, granularity=DEFAULT_GRANULARITY):
+    """True when the word records carry pos/entity values that only the pipeline can produce."""
+    return granularity == "word" and any(name in nlp.pipe_names for name in WORD_LEVEL_PIPES)
+
+
+def make_single_sentence_doc(nlp, text):
+    """Tokenize text without running the pipeline and mark it as one sentence."""
+    doc = nlp.make_doc(text)
+    for token in doc[1:]:
+        token.is_sent_start = False
+    return doc
+
+
+def detect_block_languages(texts, default_lang, lang_detector="script"):
+    """Return one spaCy language code per text, or None when the default model applies."""
+    if lang_detector == "ngram":
+        scripts = classify_languages(texts, exception_only=True)
+        ngrams = identify_languages(texts)
+        return [
+            script or (ngram if ngram != default_lang else None)
+            for script, ngram in zip(scripts, ngrams)
+        ]
+    return classify_languages(texts)
+
+
+def process_text_blocks(blocks, default_nlp, batch_size=NLP_BATCH_SIZE, n_process=1,
+                        lang_detector="script", granularity=DEFAULT_GRANULARITY):
+    """
+    Run NLP over many blocks at once.
+
+    Blocks are grouped by detected language and each group goes through a single
+    nlp.pipe call, which avoids the per-call overhead of nlp(text). Short strings
+    skip the pipeline when no word-level analysis is needed (see is_short_text).
+    Repeated texts (menus, footers, alt texts) are detected and parsed once and
+    the records are re-keyed for every other block; the structured part is
+    shared between those blocks. With a segment cache configured, texts seen in
+    earlier runs are not parsed at all.
+
+    Args:
+        blocks: list of (block_id, text) pairs.
+        default_nlp: pipeline used when no exception language is detected.
+
+    Returns:
+        A list of (structured, flattened, sentence_tokens) in the order of blocks.
+    """
+    first_index = {}
+    for index, (_, text) in enumerate(blocks):
+        first_index.setdefault(text, index)
+    unique = list(first_index.values())
+
+    groups = {}
+    lang_codes = detect_block_languages([blocks[i][1] for i in unique], default_nlp.lang, lang_detector)
+    for index, lang_code in zip(unique, lang_codes):
+        groups.setdefault(lang_code, []).append(index)
+
+    results = [None] * len(blocks)
+    if _profiler is not None:
+        _profiler.count("blocks", len(blocks))
+        _profiler.count("unique_blocks", len(unique))
+    for lang_code, indices in groups.items():
+        nlp = default_nlp if not lang_code else load_spacy_model(lang_code, granularity)
+        language = lang_code or "default"
+        if _segment_cache is not None:
+            model_id = model_fingerprint(nlp)
+            keys = {i: cache_key(blocks[i][1], model_id, language, granularity) for i in indices}
+            cached = _segment_cache.get_many(keys.values())
+            for i in indices:
+                if keys[i] in cached:
+                    results[i] = records_from_structured(blocks[i][0], cached[keys[i]])
+            indices = [i for i in indices if results[i] is None]
+            if _profiler is not None:
+                _profiler.count("segment_cache_hits", len(cached))
+        missed = indices
+
+        with profile_phase("nlp"):
+            if not needs_word_analysis(nlp, granularity):
+                short = [i for i in indices if is_short_text(blocks[i][1])]
+                for i in short:
+                    doc = make_single_sentence_doc(nlp, blocks[i][1])
+                    results[i] = build_block_records(blocks[i][0], doc, language, granularity)
+                if short:
+                    indices = [i for i in indices if results[i] is None]
+                if _profiler is not None:
+                    _profiler.count("short_blocks", len(short))
+
+            texts = [blocks[i][1] for i in indices]
+            docs = nlp.pipe(texts, batch_size=batch_size, n_process=n_process)
+            if _profiler is None:
+                for i, doc in zip(indices, docs):
+                    results[i] = build_block_records(blocks[i][0], doc, language, granularity)
+            else:
+                # Per-block time is the wait for its Doc plus building its records;
+                # with batch_size > 1 the first block of a batch carries the batch.
+                _profiler.count("pipeline_blocks", len(indices))
+                started = time.perf_counter()
+                for i, doc in zip(indices, docs):
+                    results[i] = build_block_records(blocks[i][0], doc, language, granularity)
+                    now = time.perf_counter()
+                    _profiler.record_block(blocks[i][0], blocks[i][1], now - started)
+                    started = now
+
+        if _segment_cache is not None:
+            _segment_cache.put_many((keys[i], results[i][0]) for i in missed)
+
+    for index, (block_id, text) in enumerate(blocks):
+        if results[index] is None:
+            source = first_index[text]
+            results[index] = rekey_block_records(results[source], blocks[source][0], block_id)
+    return results
+
+
+def records_from_structured(block_id, structured):
+    """Rebuild the (structured, flattened, sentence_tokens) triple from stored structured records."""
+    flattened = {}
+    sentence_tokens = []
+    for s_key, sentence in structured.items():
+        sentence_id = f"{block_id}_{s_key}"
+        flattened[sentence_id] = sentence["text"]
+        sentence_tokens.append((sentence_id, sentence["text"]))
+        for w_key, word in sentence.get("words", {}).items():
+            flattened[f"{sentence_id}_{w_key}"] = word["text"]
+    return structured, flattened, sentence_tokens
+
+
+def rekey_block_records(records, block_id, new_block_id):
+    """Copy the records built for block_id over to new_block_id."""
+    structured, flattened, sentence_tokens = records
+    prefix = len(block_id)
+    return (
+        structured,
+        {new_block_id + key[prefix:]: value for key, value in flattened.items()},
+        [(new_block_id + sentence_id[prefix:], text) for sentence_id, text in sentence_tokens]
+    )
+
+
+def collect_jsonld_blocks(obj, block_counter, pending):
+    """Queue the translatable string values of a JSON-LD object; returns the next block number."""
     if isinstance(obj, dict):
         for key in list(obj.keys()):
             value = obj[key]
@@ -341,151 +927,53 @@ def extract_from_jsonld(obj, block_counter, nlp, structured_output, flattened_ou
                         )
                     )
                 ):
-                    block_id = f"BLOCK_{block_counter}"
-                    structured, flattened, tokens = process_text_block(block_id, value, nlp)
-                    obj[key] = tokens[0][0]
-                    structured_output[block_id] = {"jsonld": key, "tokens": structured}
-                    flattened_output.update(flattened)
+                    def apply(tokens, obj=obj, key=key):
+                        obj[key] = tokens[0][0]
+                    pending.append((f"BLOCK_{block_counter}", value, {"jsonld": key}, apply))
                     block_counter += 1
             elif isinstance(value, (dict, list)):
-                block_counter = extract_from_jsonld(value, block_counter, nlp, structured_output, flattened_output)
+                block_counter = collect_jsonld_blocks(value, block_counter, pending)
     elif isinstance(obj, list):
         for i in range(len(obj)):
-            block_counter = extract_from_jsonld(obj[i], block_counter, nlp, structured_output, flattened_output)
+            block_counter = collect_jsonld_blocks(obj[i], block_counter, pending)
     return block_counter
 
 
-def extract_translatable_html(input_path, lang_code):
-    nlp = load_spacy_model(lang_code)
-
-    with open(input_path, "r", encoding="utf-8") as f:
-        soup = BeautifulSoup(f, "html5lib")
-
-    structured_output = {}
-    flattened_output = {}
-    block_counter = 1
-
-    elements = list(soup.find_all(string=True))  # Fix 1: Precompute elements
-    for element in elements:
-        if is_translatable_text(element):
-            text = element.strip()
-            if not text:
-                continue
-
-            structured, flattened, sentence_tokens = process_text_block(f"BLOCK_{block_counter}", text, nlp)
-
-            if sentence_tokens:
-                block_id = f"BLOCK_{block_counter}"
-                parent_tag = element.parent.name if element.parent else "no_parent"  # Fix 2: Parent check
-                structured_output[block_id] = {"tag": parent_tag, "tokens": structured}
-                flattened_output.update(flattened)
-                
-                # Fix 3: Safe replacement
-                replacement_content = " ".join([token[0] for token in sentence_tokens])
-                if not isinstance(replacement_content, NavigableString):
-                    replacement_content = NavigableString(str(replacement_content))
-                element.replace_with(replacement_content)
-                
-                block_counter += 1
-
-    for tag in soup.find_all():
-        for attr in TRANSLATABLE_ATTRS:
-            if (
-                attr in tag.attrs and 
-                isinstance(tag[attr], str) and 
-                attr not in BLOCKED_ATTRS
-            ):
-                value = tag[attr].strip()
-                if value:
-                    block_id = f"BLOCK_{block_counter}"
-                    structured, flattened, sentence_tokens = process_text_block(block_id, value, nlp)
-                    structured_output[block_id] = {"attr": attr, "tokens": structured}
-                    flattened_output.update(flattened)
-                    if sentence_tokens:
-                        tag[attr] = sentence_tokens[0][0]
-                    block_counter += 1
-
-    for meta in soup.find_all("meta"):
-        name = meta.get("name", "").lower()
-        prop = meta.get("property", "").lower()
-        content = meta.get("content", "").strip()
-
-        if name in EXCLUDED_META_NAMES or prop in EXCLUDED_META_PROPERTIES:
-            continue
-
-        if content and (
-            (name and name in SEO_META_FIELDS["name"]) or
-            (prop and prop in SEO_META_FIELDS["property"])
-        ):
-            block_id = f"BLOCK_{block_counter}"
-            structured, flattened, sentence_tokens = process_text_block(block_id, content, nlp)
-            structured_output[block_id] = {"meta": name or prop, "tokens": structured}
-            flattened_output.update(flattened)
-            if sentence_tokens:
-                meta["content"] = sentence_tokens[0][0]
-            block_counter += 1
-
-    title_tag = soup.title
-    if title_tag and title_tag.string and title_tag.string.strip():
-        block_id = f"BLOCK_{block_counter}"
-        text = title_tag.string.strip()
-        structured, flattened, sentence_tokens = process_text_block(block_id, text, nlp)
-        structured_output[block_id] = {"tag": "title", "tokens": structured}
-        flattened_output.update(flattened)
-        if sentence_tokens:
-            title_tag.string.replace_with(sentence_tokens[0][0])
-        block_counter += 1
+def block_type(block_data):
+    """Determine the block type (tag/attr/meta/jsonld) of a structured block."""
+    return (
+        block_data.get("tag") or 
+        block_data.get("attr") or 
+        block_data.get("meta") or 
+        block_data.get("jsonld") or 
+        "unknown"
+    )
 
-    for script_tag in soup.find_all("script", {"type": "application/ld+json"}):
-        try:
-            raw_json = script_tag.string.strip()
-            data = json.loads(raw_json)
-            block_counter = extract_from_jsonld(data, block_counter, nlp, structured_output, flattened_output)
-            script_tag.string.replace_with(json.dumps(data, ensure_ascii=False, indent=2))
-        except Exception as e:
-            print(f"⚠️ Failed to parse or process JSON-LD: {e}")
-            continue
 
+def flat_block_entry(block_id, block_data):
+    """Build the translatable_flat.json entry of a structured block."""
+    # Get full text (fallback: join all sentences)
+    full_text = block_data.get("text", " ".join(
+        s_data["text"] for s_data in block_data["tokens"].values()
+    ))
 
-    reformatted_flattened = {}
-    for block_id, block_data in structured_output.items():
-        # Determine the block type (tag/attr/meta/jsonld)
-        block_type = (
-            block_data.get("tag") or 
-            block_data.get("attr") or 
-            block_data.get("meta") or 
-            block_data.get("jsonld") or 
-            "unknown"
-        )
-    
-        # Get full text (fallback: join all sentences)
-        full_text = block_data.get("text", " ".join(
-            s_data["text"] for s_data in block_data["tokens"].values()
-        ))
-    
-        reformatted_flattened[block_id] = {
-            "type": block_type,  # "p", "alt", "og:title", etc.
-            "text": full_text,
-            "segments": {  # Renamed from "tokens" for clarity
-                f"{block_id}_{s_key}": s_data["text"]
-                for s_key, s_data in block_data["tokens"].items()
-            }
+    return {
+        "type": block_type(block_data),  # "p", "alt", "og:title", etc.
+        "text": full_text,
+        "segments": {  # Renamed from "tokens" for clarity
+            f"{block_id}_{s_key}": s_data["text"]
+            for s_key, s_data in block_data["tokens"].items()
         }
+    }
 
-    with open("translatable_flat.json", "w", encoding="utf-8") as f:
-         json.dump(reformatted_flattened, f, indent=2, ensure_ascii=False)
-    
-    with open("translatable_structured.json", "w", encoding="utf-8") as f:
-        json.dump(structured_output, f, indent=2, ensure_ascii=False)
 
-    with open("non_translatable.html", "w", encoding="utf-8") as f:
-        f.write(str(soup))
+def group_sentences_by_length(sentences):
+    """
+    Build the translatable_flat_sentences.json structure.
 
-    flat_sentences_only = {
-        k: v for k, v in flattened_output.items()
-        if "_S" in k and "_W" not in k
-    }
-    
+    Args:
+        sentences: iterable of (sentence_id, text, tag_type) in block order.
+    """
     # Create categorized structure for flat_sentences_only
     categorized_sentences = {
         "1_word": [],
@@ -496,21 +984,7 @@ def extract_translatable_html(input_path, lang_code):
     
     # Group blocks by text content and tag
     text_tag_groups = {}
-    for block_id, text in flat_sentences_only.items():
-        # Get block number from block_id
-        block_num = block_id.split('_')[1]
-        full_block_id = f"BLOCK_{block_num}"
-        
-        # Get tag information from structured_output
-        block_data = structured_output.get(full_block_id, {})
-        tag_type = (
-            block_data.get("tag") or 
-            block_data.get("attr") or 
-            block_data.get("meta") or 
-            block_data.get("jsonld") or 
-            "unknown"
-        )
-        
+    for block_id, text, tag_type in sentences:
         # Create composite key for text and tag combination
         key = f"{text}||{tag_type}"
         
@@ -559,22 +1033,803 @@ def extract_translatable_html(input_path, lang_code):
                     "tag": f"<{combo_data['tag']}>"
                 }
                 categorized_sentences[category].append(entry)
-    
-    # Write the categorized sentences to file
-    with open("translatable_flat_sentences.json", "w", encoding="utf-8") as f:
-        json.dump(categorized_sentences, f, indent=2, ensure_ascii=False)
 
-    
-    with open("translatable_flat.json", "w", encoding="utf-8") as f:
-         json.dump(reformatted_flattened, f, indent=2, ensure_ascii=False)
-    
-    with open("translatable_structured.json", "w", encoding="utf-8") as f:
-        json.dump(structured_output, f, indent=2, ensure_ascii=False)
+    return categorized_sentences
+
+
+# HTML parser backends ---------------------------------------------
+class SoupEngine:
+    """
+    HTML backend built on a BeautifulSoup tree builder.
+
+    Extraction only talks to the engine to parse, traverse nodes, replace text
+    and serialize, so backends can be swapped with --parser.
+    """
+
+    def __init__(self, features):
+        self.features = features
+
+    def available(self):
+        return builder_registry.lookup(self.features) is not None
+
+    def parse(self, source):
+        return BeautifulSoup(source, self.features)
+
+    def iter_nodes(self, soup):
+        return iter_nodes_with_translate(soup)
+
+    def replace_text(self, node, text):
+        replacement = NavigableString(str(text))
+        node.replace_with(replacement)
+        return replacement
+
+    def serialize(self, soup):
+        return str(soup)
+
+
+HTML_PARSERS = {
+    "html5lib": SoupEngine("html5lib"),       # browser-grade, slowest
+    "lxml": SoupEngine("lxml"),               # C parser, fastest
+    "html.parser": SoupEngine("html.parser")  # standard library
+}
+DEFAULT_PARSER = "html5lib"
+
+
+def get_html_engine(name):
+    engine = HTML_PARSERS.get(name)
+    if engine is None or not engine.available():
+        print(f"HTML parser '{name}' is not available. Install it or choose from: {', '.join(HTML_PARSERS)}.")
+        sys.exit(1)
+    return engine
+
+
+@contextmanager
+def atomic_output(path, binary=False):
+    """Write path through a temporary file in the same folder that replaces it on success."""
+    tmp_path = os.path.join(
+        os.path.dirname(os.path.abspath(path)), f".{os.path.basename(path)}.{uuid.uuid4().hex}.tmp"
+    )
+    # Created like open(path, "w") would, so the kernel applies the umask
+    fd = os.open(tmp_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY | getattr(os, "O_BINARY", 0), 0o666)
+    try:
+        with os.fdopen(fd, "wb" if binary else "w", encoding=None if binary else "utf-8") as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def dumps_json(data, json_format=DEFAULT_JSON_FORMAT):
+    if json_format == "fast":
+        if orjson is not None:
+            return orjson.dumps(data).decode("utf-8")
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return json.dumps(data, indent=2, ensure_ascii=False)
+
+
+def write_json_output(path, data, json_format=DEFAULT_JSON_FORMAT):
+    with atomic_output(path) as f:
+        f.write(dumps_json(data, json_format))
+
+
+def write_structured_output(structured_output, path, structured_format=DEFAULT_STRUCTURED_FORMAT,
+                            json_format=DEFAULT_JSON_FORMAT):
+    if structured_format == "packed":
+        with atomic_output(path, binary=True) as f:
+            writer = ArtifactWriter(f)
+            for block_id, block_data in structured_output.items():
+                writer.write(block_id, block_data)
+            writer.close()
+        return
+    write_json_output(path, structured_output, json_format)
+
+
+class ExtractionResult:
+    """
+    In-memory step 1 artifacts of one page.
+
+    structured and flattened are filled by the extraction; flat, sentence_groups
+    and html are built on first access. write() saves any subset as files.
+    """
+
+    def __init__(self, structured, flattened, engine, soup):
+        self.structured = structured   # translatable_structured.json content
+        self.flattened = flattened     # sentence and word ids -> text
+        self._engine = engine
+        self._soup = soup
+        self._flat = None
+        self._sentence_groups = None
+        self._html = None
+        self.manifest = None           # per-block text digests and records, see --incremental
+        self.changes = None            # diff against the previous manifest, if one was given
+
+    @property
+    def flat(self):
+        """translatable_flat.json content."""
+        if self._flat is None:
+            self._flat = {
+                block_id: flat_block_entry(block_id, block_data)
+                for block_id, block_data in self.structured.items()
+            }
+        return self._flat
+
+    @property
+    def sentence_groups(self):
+        """translatable_flat_sentences.json content."""
+        if self._sentence_groups is None:
+            flat_sentences_only = {
+                k: v for k, v in self.flattened.items()
+                if "_S" in k and "_W" not in k
+            }
+            self._sentence_groups = group_sentences_by_length(
+                (sentence_id, text, block_type(self.structured.get(sentence_id.rsplit("_", 1)[0], {})))
+                for sentence_id, text in flat_sentences_only.items()
+            )
+        return self._sentence_groups
+
+    @property
+    def html(self):
+        """non_translatable.html content: the page with block placeholders."""
+        if self._html is None:
+            self._html = self._engine.serialize(self._soup)
+        return self._html
+
+    def write(self, output_dir=".", outputs=OUTPUTS, structured_format=DEFAULT_STRUCTURED_FORMAT,
+              json_format=DEFAULT_JSON_FORMAT, suffix=""):
+        """
+        Write the selected artifacts into output_dir.
+
+        suffix is added to every file stem, e.g. "_index" gives translatable_flat_index.json.
+        Returns {output name: path written}.
+        """
+        def target(filename):
+            stem, ext = os.path.splitext(filename)
+            return os.path.join(output_dir, f"{stem}{suffix}{ext}")
+
+        with profile_phase("serialization"):
+            return self._write(target, outputs, structured_format, json_format)
+
+    def _write(self, target, outputs, structured_format, json_format):
+        written = {}
+        if "flat" in outputs:
+            written["flat"] = target(OUTPUT_FILES["flat"])
+            write_json_output(written["flat"], self.flat, json_format)
+        if "structured" in outputs:
+            written["structured"] = target(STRUCTURED_FILES[structured_format])
+            write_structured_output(self.structured, written["structured"], structured_format, json_format)
+        if "sentences" in outputs:
+            written["sentences"] = target(OUTPUT_FILES["sentences"])
+            write_json_output(written["sentences"], self.sentence_groups, json_format)
+        if "html" in outputs:
+            written["html"] = target(OUTPUT_FILES["html"])
+            with atomic_output(written["html"]) as f:
+                f.write(self.html)
+        return written
+
+    def write_manifest(self, path):
+        with profile_phase("serialization"):
+            write_json_output(path, self.manifest, "fast")
+
+
+def dom_path(element):
+    """Tag names from the root down to element, e.g. html/body/div/p."""
+    names = []
+    while element is not None and element.name != "[document]":
+        names.append(element.name)
+        element = element.parent
+    return "/".join(reversed(names))
+
+
+def text_digest(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def block_location(anchor, header):
+    """Where a block sits on the page: the anchor's DOM path and the block header."""
+    return "\x1f".join([dom_path(anchor), json.dumps(header, sort_keys=True)])
+
+
+def stable_block_ids(pending, anchors):
+    """
+    Content-addressed ids for the pending blocks.
+
+    The hash covers the anchor element's DOM path, the block header and the
+    text; repeats of the same triple are told apart by their occurrence count.
+    Inserting or removing a block leaves the ids of all other blocks unchanged.
+    """
+    seen = {}
+    used = set()
+    ids = []
+    for (_, text, header, _), anchor in zip(pending, anchors):
+        key = "\x1f".join([block_location(anchor, header), text])
+        occurrence = seen.get(key, 0)
+        seen[key] = occurrence + 1
+        if occurrence:
+            key = f"{key}\x1f{occurrence}"
+        digest = text_digest(key)
+        length = STABLE_ID_LENGTH
+        while f"BLOCK_{digest[:length]}" in used:  # truncated hash collision
+            length += 1
+        block_id = f"BLOCK_{digest[:length]}"
+        used.add(block_id)
+        ids.append(block_id)
+    return ids
+
+
+def load_manifest(path):
+    """Return the extraction manifest at path, or None when missing or unreadable."""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"⚠️ Ignoring unreadable manifest {path}: {e}")
+        return None
+    if manifest.get("version") != MANIFEST_VERSION:
+        print(f"⚠️ Ignoring manifest {path}: version {manifest.get('version')} is not {MANIFEST_VERSION}")
+        return None
+    return manifest
+
+
+def manifest_changes(previous, current, reused_count):
+    """
+    Block ids added, edited and removed since the previous manifest.
+
+    Stable ids hash the text, so an edited block shows up as a new id and a
+    missing one. Such pairs at the same location (see block_location) are
+    reported as edited [old id, new id], matched in document order.
+    """
+    previous_blocks = previous.get("blocks", {})
+    current_blocks = current["blocks"]
+    added = [block_id for block_id in current_blocks if block_id not in previous_blocks]
+    removed = [block_id for block_id in previous_blocks if block_id not in current_blocks]
+
+    removed_at = {}
+    for block_id in removed:
+        location = previous_blocks[block_id].get("location")
+        if location is not None:
+            removed_at.setdefault(location, []).append(block_id)
+    edited = []
+    for block_id in added:
+        candidates = removed_at.get(current_blocks[block_id]["location"])
+        if candidates:
+            edited.append([candidates.pop(0), block_id])
+    paired = {block_id for pair in edited for block_id in pair}
+
+    return {
+        "added": [block_id for block_id in added if block_id not in paired],
+        "edited": edited,
+        "removed": [block_id for block_id in removed if block_id not in paired],
+        "reused": reused_count,
+        "settings_changed": previous.get("settings") != current["settings"],
+    }
+
+
+def extract_translatable(source, lang_code, secondary_lang=None,
+                         batch_size=NLP_BATCH_SIZE, n_process=1, lang_detector="script",
+                         parser=DEFAULT_PARSER, granularity=DEFAULT_GRANULARITY,
+                         block_ids="sequential", previous_manifest=None):
+    """
+    Extract the translatable blocks of one page and return an ExtractionResult.
+
+    source is the HTML as str or bytes, or a pathlib.Path / os.PathLike to read.
+    Nothing is written; models stay warm in the pool between calls.
+
+    block_ids="stable" gives content-addressed ids. With previous_manifest (the
+    result.manifest of an earlier run with the same settings), unchanged
+    blocks reuse their records and only added or edited blocks go through NLP;
+    result.changes lists the differences.
+    """
+    engine = get_html_engine(parser)
+    preload_spacy_models(lang_code, secondary_lang, granularity=granularity)
+    nlp = load_spacy_model(lang_code, granularity)
+    if _profiler is not None:
+        _profiler.start_memory_trace()
+
+    with profile_phase("parse"):
+        if isinstance(source, os.PathLike):
+            with open(source, "r", encoding="utf-8") as f:
+                soup = engine.parse(f)
+        else:
+            soup = engine.parse(source)
+
+    structured_output = {}
+    flattened_output = {}
+    block_counter = 1
+
+    # Collection phase: every candidate block is queued as
+    # (block_id, text, block header, apply(sentence_tokens)) and NLP runs once at the end.
+    pending = []
+    anchors = []     # element each pending block belongs to, for stable ids
+    finalizers = []
+
+    # Single pass over the tree. Text blocks are numbered as they are met; the
+    # attribute, meta, title and JSON-LD candidates are gathered on the way and
+    # numbered after all text, in that order, as downstream consumers expect.
+    math_cache = {}
+    attr_candidates = []
+    meta_candidates = []
+    title_tag = None
+    jsonld_scripts = []
+
+    for node, translate_override in engine.iter_nodes(soup):
+        if isinstance(node, NavigableString):
+            parent_tag = node.parent.name if node.parent else "no_parent"  # Fix 2: Parent check
+            # Script, style, code... text can only be forced in by translate="yes";
+            # skip it without stripping or classifying it.
+            if parent_tag in SKIP_PARENTS and translate_override != "yes":
+                continue
+            if not is_translatable_text(node, translate_override, math_cache):
+                continue
+            text = node.strip()
+            if not text:
+                continue
+
+            block_id = f"BLOCK_{block_counter}"
+
+            # Swap the node out right away so later parent.text checks see the
+            # same (placeholder) content as before; the final ids are set in apply.
+            forget_math_context(node, math_cache)
+            placeholder = engine.replace_text(node, block_id)
+
+            def apply(sentence_tokens, placeholder=placeholder):
+                engine.replace_text(placeholder, " ".join([token[0] for token in sentence_tokens]))
+
+            pending.append((block_id, text, {"tag": parent_tag}, apply))
+            anchors.append(node.parent)
+            block_counter += 1
+            continue
+
+        if node.attrs:
+            for attr, value in translatable_attrs(node.attrs):
+                def apply(sentence_tokens, tag=node, attr=attr):
+                    tag[attr] = sentence_tokens[0][0]
+                attr_candidates.append((value, {"attr": attr}, apply, node))
+
+        if node.name == "meta":
+            meta_key = seo_meta_key(node.attrs)
+            if meta_key:
+                def apply(sentence_tokens, meta=node):
+                    meta["content"] = sentence_tokens[0][0]
+                meta_candidates.append((node["content"].strip(), {"meta": meta_key}, apply, node))
+        elif node.name == "title":
+            if title_tag is None:
+                title_tag = node
+        elif node.name == "script" and node.get("type") == "application/ld+json":
+            jsonld_scripts.append(node)
+
+    for text, header, apply, anchor in attr_candidates + meta_candidates:
+        pending.append((f"BLOCK_{block_counter}", text, header, apply))
+        anchors.append(anchor)
+        block_counter += 1
+
+    # Title and JSON-LD are read after the walk, once any forced text inside
+    # them has been swapped for its placeholder.
+    if title_tag and title_tag.string and title_tag.string.strip():
+        text = title_tag.string.strip()
+        def apply(sentence_tokens, title_string=title_tag.string):
+            engine.replace_text(title_string, sentence_tokens[0][0])
+        pending.append((f"BLOCK_{block_counter}", text, {"tag": "title"}, apply))
+        anchors.append(title_tag)
+        block_counter += 1
+
+    for script_tag in jsonld_scripts:
+        try:
+            raw_json = script_tag.string.strip()
+            data = json.loads(raw_json)
+            block_counter = collect_jsonld_blocks(data, block_counter, pending)
+            def finalize(script_string=script_tag.string, data=data):
+                engine.replace_text(script_string, json.dumps(data, ensure_ascii=False, indent=2))
+            finalizers.append(finalize)
+        except Exception as e:
+            print(f"⚠️ Failed to parse or process JSON-LD: {e}")
+            continue
+        finally:
+            anchors.extend([script_tag] * (len(pending) - len(anchors)))
+
+    locations = [block_location(anchor, header) for (_, _, header, _), anchor in zip(pending, anchors)]
+    if block_ids == "stable":
+        pending = [
+            (stable_id, text, header, apply)
+            for stable_id, (_, text, header, apply) in zip(stable_block_ids(pending, anchors), pending)
+        ]
+
+    # Incremental mode: blocks whose id and text match the previous manifest keep their records.
+    settings = {
+        "lang": lang_code, "secondary_lang": secondary_lang, "granularity": granularity,
+        "lang_detector": lang_detector, "parser": parser, "block_ids": block_ids,
+        "model": model_fingerprint(nlp)
+    }
+    reused = {}
+    if previous_manifest and previous_manifest.get("settings") == settings:
+        previous_blocks = previous_manifest.get("blocks", {})
+        for block_id, text, _, _ in pending:
+            entry = previous_blocks.get(block_id)
+            if entry and entry["sha"] == text_digest(text):
+                reused[block_id] = entry["tokens"]
+
+    # NLP phase: one nlp.pipe pass per detected language, scattered back by BLOCK_N id.
+    computed = iter(process_text_blocks(
+        [(block_id, text) for block_id, text, _, _ in pending if block_id not in reused],
+        nlp, batch_size=batch_size, n_process=n_process, lang_detector=lang_detector,
+        granularity=granularity
+    ))
+    manifest_blocks = {}
+    for (block_id, text, header, apply), location in zip(pending, locations):
+        if block_id in reused:
+            structured, flattened, sentence_tokens = records_from_structured(block_id, reused[block_id])
+        else:
+            structured, flattened, sentence_tokens = next(computed)
+        structured_output[block_id] = {**header, "tokens": structured}
+        flattened_output.update(flattened)
+        manifest_blocks[block_id] = {"sha": text_digest(text), "location": location, "tokens": structured}
+        if sentence_tokens:
+            apply(sentence_tokens)
+    for finalize in finalizers:
+        finalize()
+
+    result = ExtractionResult(structured_output, flattened_output, engine, soup)
+    result.manifest = {"version": MANIFEST_VERSION, "settings": settings, "blocks": manifest_blocks}
+    if previous_manifest is not None:
+        result.changes = manifest_changes(previous_manifest, result.manifest, len(reused))
+    return result
+
+
+def extract_translatable_html(input_path, lang_code, secondary_lang=None,
+                              batch_size=NLP_BATCH_SIZE, n_process=1, lang_detector="script",
+                              parser=DEFAULT_PARSER, granularity=DEFAULT_GRANULARITY,
+                              structured_format=DEFAULT_STRUCTURED_FORMAT, outputs=OUTPUTS,
+                              json_format=DEFAULT_JSON_FORMAT, block_ids="sequential",
+                              manifest_path=None):
+    """
+    Extract input_path and write the selected artifacts into the current directory.
+
+    With manifest_path, the page is diffed against the manifest of the previous
+    run (stable ids are implied) and the manifest is updated.
+    """
+    if manifest_path:
+        block_ids = "stable"
+    result = extract_translatable(
+        Path(input_path), lang_code, secondary_lang,
+        batch_size=batch_size, n_process=n_process, lang_detector=lang_detector,
+        parser=parser, granularity=granularity,
+        block_ids=block_ids, previous_manifest=load_manifest(manifest_path)
+    )
+    result.write(".", outputs, structured_format, json_format)
+    if manifest_path:
+        result.write_manifest(manifest_path)
+        if result.changes:
+            changes = result.changes
+            print(f"🔁 Incremental: {len(changes['added'])} added, {len(changes['edited'])} edited, "
+                  f"{len(changes['removed'])} removed, {changes['reused']} blocks reused")
+        else:
+            print(f"🔁 Incremental: no previous manifest, wrote {manifest_path}")
+    return result
+
+
+# Streaming extraction ---------------------------------------------
+STREAM_READ_SIZE = 1 << 16      # characters fed to the tokenizer at a time
+STREAM_BATCH_BLOCKS = 512       # queued blocks that trigger an NLP flush
+STREAM_BUFFER_CHARS = 1 << 20   # buffered output characters that trigger a flush
+
+VOID_ELEMENTS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link",
+    "meta", "param", "source", "track", "wbr"
+}
+
+
+class JsonObjectStreamWriter:
+    """Write a JSON object entry by entry, laid out like dumps_json(json_format)."""
+
+    def __init__(self, f, json_format=DEFAULT_JSON_FORMAT):
+        self.f = f
+        self.compact = json_format == "fast"
+        self.count = 0
+
+    def write(self, key, value):
+        key = json.dumps(key, ensure_ascii=False)
+        if self.compact:
+            self.f.write(f"{'{' if self.count == 0 else ','}{key}:{dumps_json(value, 'fast')}")
+        else:
+            body = json.dumps(value, indent=2, ensure_ascii=False).replace("\n", "\n  ")
+            prefix = "{\n  " if self.count == 0 else ",\n  "
+            self.f.write(f"{prefix}{key}: {body}")
+        self.count += 1
+
+    def close(self):
+        if self.compact:
+            self.f.write("}" if self.count else "{}")
+        else:
+            self.f.write("\n}" if self.count else "{}")
+
+
+def _render_start_tag(tag, attrs, self_closing=False):
+    parts = [f"<{tag}"]
+    for name, value in attrs.items():
+        if value is None:
+            parts.append(f" {name}")
+        else:
+            parts.append(f' {name}="{html.escape(value, quote=True)}"')
+    parts.append("/>" if self_closing else ">")
+    return "".join(parts)
+
+
+class StreamingExtractor(HTMLParser):
+    """
+    Incremental counterpart of extract_translatable_html.
+
+    The HTML is tokenized chunk by chunk. Translatable text, attributes, meta
+    content, the title and JSON-LD values are queued as blocks. Every
+    STREAM_BATCH_BLOCKS blocks, or once STREAM_BUFFER_CHARS characters of
+    output are waiting, NLP runs and the buffered output up to that point is
+    written with its placeholders. Output with no block pending is written
+    straight through. Memory stays bounded by the batch, not by the document.
+
+    Differences from the tree-based extractor:
+    - blocks are numbered in document order instead of text/attrs/meta/title/JSON-LD order
+    - the LaTeX part of the math check looks at the text itself, not the whole parent
+    - markup is not repaired (no html5lib tree building), so unchanged markup is copied verbatim
+    """
+
+    def __init__(self, out, structured_writer, flat_writer, nlp,
+                 batch_size=NLP_BATCH_SIZE, n_process=1, lang_detector="script",
+                 granularity=DEFAULT_GRANULARITY):
+        super().__init__(convert_charrefs=False)
+        self.out = out
+        self.structured_writer = structured_writer
+        self.flat_writer = flat_writer
+        self.nlp = nlp
+        self.batch_size = batch_size
+        self.n_process = n_process
+        self.lang_detector = lang_detector
+        self.granularity = granularity
+
+        self.stack = []          # open elements: (tag, translate state, classes)
+        self.buffer = []         # output pieces: str, or callables rendered after NLP
+        self.buffered_chars = 0
+        self.pending = []        # (block_id, text, header, apply)
+        self.sentences = []      # (sentence_id, text, tag_type) for translatable_flat_sentences.json
+        self.block_counter = 1
+        self.text_raw = []
+        self.text = []
+        self.title_done = False
+        self.jsonld_raw = None   # collecting the body of an ld+json script
+
+    # Blocks and flushing
+    def _queue(self, text, header, apply):
+        block_id = f"BLOCK_{self.block_counter}"
+        self.pending.append((block_id, text, header, apply))
+        self.block_counter += 1
+        return block_id
+
+    def flush_blocks(self):
+        results = process_text_blocks(
+            [(block_id, text) for block_id, text, _, _ in self.pending],
+            self.nlp, batch_size=self.batch_size, n_process=self.n_process,
+            lang_detector=self.lang_detector, granularity=self.granularity
+        )
+        for (block_id, _, header, apply), (structured, _, sentence_tokens) in zip(self.pending, results):
+            block_data = {**header, "tokens": structured}
+            if self.structured_writer is not None:
+                self.structured_writer.write(block_id, block_data)
+            if self.flat_writer is not None:
+                self.flat_writer.write(block_id, flat_block_entry(block_id, block_data))
+            tag_type = block_type(block_data)
+            self.sentences.extend((sid, text, tag_type) for sid, text in sentence_tokens)
+            if sentence_tokens:
+                apply(sentence_tokens)
+        self.pending = []
+
+        if self.out is not None:
+            for piece in self.buffer:
+                self.out.write(piece if isinstance(piece, str) else piece())
+        self.buffer = []
+        self.buffered_chars = 0
+
+    def _emit(self, piece):
+        if isinstance(piece, str):
+            if self.out is None:
+                return
+            if not self.buffer:
+                # Nothing waits for NLP: no need to hold the piece back
+                self.out.write(piece)
+                return
+            self.buffered_chars += len(piece)
+        self.buffer.append(piece)
+        if len(self.pending) >= STREAM_BATCH_BLOCKS or self.buffered_chars >= STREAM_BUFFER_CHARS:
+            self.flush_blocks()
+
+    # Text
+    def flush_text(self):
+        if not self.text_raw:
+            return
+        raw = "".join(self.text_raw)
+        text = "".join(self.text)
+        self.text_raw, self.text = [], []
+
+        if self.jsonld_raw is not None:
+            self.jsonld_raw.append(raw)
+            return
+
+        parent_tag, translate_override, classes = self.stack[-1] if self.stack else (None, None, ())
+        stripped = text.strip()
+
+        if parent_tag == "title" and not self.title_done:
+            self.title_done = True
+            if stripped:
+                replacement = {"value": raw}
+                def apply(sentence_tokens, replacement=replacement):
+                    replacement["value"] = sentence_tokens[0][0]
+                self._queue(stripped, {"tag": "title"}, apply)
+                self._emit(lambda replacement=replacement: replacement["value"])
+                return
+
+        def has_math_markup():
+            return (
+                parent_tag == "math" or
+                any(cls in classes for cls in MATH_CLASSES) or
+                LATEX_PATTERN.search(text) is not None
+            )
+
+        if is_translatable_string(stripped, parent_tag, translate_override, has_math_markup):
+            replacement = {"value": raw}
+            def apply(sentence_tokens, replacement=replacement):
+                replacement["value"] = " ".join([token[0] for token in sentence_tokens])
+            self._queue(stripped, {"tag": parent_tag}, apply)
+            self._emit(lambda replacement=replacement: replacement["value"])
+        else:
+            self._emit(raw)
+
+    def handle_data(self, data):
+        self.text_raw.append(data)
+        self.text.append(data)
+
+    def handle_entityref(self, name):
+        self.text_raw.append(f"&{name};")
+        self.text.append(html.unescape(f"&{name};"))
+
+    def handle_charref(self, name):
+        self.text_raw.append(f"&#{name};")
+        self.text.append(html.unescape(f"&#{name};"))
+
+    # Markup
+    def _start(self, tag, attr_list, self_closing):
+        self.flush_text()
+        raw = self.get_starttag_text()
+        attrs = dict(attr_list)
+
+        changed = False
+        for attr, value in translatable_attrs(attrs):
+            def apply(sentence_tokens, attr=attr):
+                attrs[attr] = sentence_tokens[0][0]
+            self._queue(value, {"attr": attr}, apply)
+            changed = True
+
+        if tag == "meta":
+            meta_key = seo_meta_key(attrs)
+            if meta_key:
+                def apply(sentence_tokens):
+                    attrs["content"] = sentence_tokens[0][0]
+                self._queue(attrs["content"].strip(), {"meta": meta_key}, apply)
+                changed = True
+
+        if changed:
+            self._emit(lambda: _render_start_tag(tag, attrs, self_closing))
+        else:
+            self._emit(raw)
+
+        if not self_closing and tag not in VOID_ELEMENTS:
+            own = (attrs.get("translate") or "").lower()
+            inherited = self.stack[-1][1] if self.stack else None
+            classes = (attrs.get("class") or "").split()
+            self.stack.append((tag, own if own in {"yes", "no"} else inherited, classes))
+            if tag == "script" and attrs.get("type") == "application/ld+json":
+                self.jsonld_raw = []
+
+    def handle_starttag(self, tag, attrs):
+        self._start(tag, attrs, self_closing=False)
+
+    def handle_startendtag(self, tag, attrs):
+        self._start(tag, attrs, self_closing=True)
+
+    def handle_endtag(self, tag):
+        self.flush_text()
+        if self.jsonld_raw is not None and tag == "script":
+            self._finish_jsonld()
+
+        self._emit(f"</{tag}>")
+        for depth in range(len(self.stack) - 1, -1, -1):
+            if self.stack[depth][0] == tag:
+                del self.stack[depth:]
+                break
+
+    def _finish_jsonld(self):
+        raw_json = "".join(self.jsonld_raw)
+        self.jsonld_raw = None
+        try:
+            data = json.loads(raw_json.strip())
+            self.block_counter = collect_jsonld_blocks(data, self.block_counter, self.pending)
+            self._emit(lambda data=data: json.dumps(data, ensure_ascii=False, indent=2))
+        except Exception as e:
+            print(f"⚠️ Failed to parse or process JSON-LD: {e}")
+            self._emit(raw_json)
+
+    def handle_comment(self, data):
+        self.flush_text()
+        self._emit(f"<!--{data}-->")
+
+    def handle_decl(self, decl):
+        self.flush_text()
+        self._emit(f"<!{decl}>")
+
+    def handle_pi(self, data):
+        self.flush_text()
+        self._emit(f"<?{data}>")
+
+    def unknown_decl(self, data):
+        self.flush_text()
+        self._emit(f"<![{data}]>")
+
+    def close(self):
+        super().close()
+        self.flush_text()
+        if self.jsonld_raw is not None:
+            self._finish_jsonld()
+        self.flush_blocks()
+
+
+def extract_translatable_html_streaming(input_path, lang_code, secondary_lang=None,
+                                        batch_size=NLP_BATCH_SIZE, n_process=1,
+                                        lang_detector="script", granularity=DEFAULT_GRANULARITY,
+                                        structured_format=DEFAULT_STRUCTURED_FORMAT, outputs=OUTPUTS,
+                                        json_format=DEFAULT_JSON_FORMAT):
+    """
+    Extract with bounded memory: the HTML is read in chunks and all outputs are
+    written progressively (see StreamingExtractor for the differences from
+    extract_translatable_html).
+    """
+    preload_spacy_models(lang_code, secondary_lang, granularity=granularity)
+    nlp = load_spacy_model(lang_code, granularity)
+    if _profiler is not None:
+        _profiler.start_memory_trace()
+
+    with ExitStack() as stack:
+        source = stack.enter_context(open(input_path, "r", encoding="utf-8"))
+        html_out = structured_writer = flat_writer = None
+        if "html" in outputs:
+            html_out = stack.enter_context(atomic_output(OUTPUT_FILES["html"]))
+        if "structured" in outputs:
+            packed = structured_format == "packed"
+            structured_out = stack.enter_context(atomic_output(STRUCTURED_FILES[structured_format], binary=packed))
+            if packed:
+                structured_writer = ArtifactWriter(structured_out)
+            else:
+                structured_writer = JsonObjectStreamWriter(structured_out, json_format)
+        if "flat" in outputs:
+            flat_writer = JsonObjectStreamWriter(stack.enter_context(atomic_output(OUTPUT_FILES["flat"])), json_format)
+
+        extractor = StreamingExtractor(
+            html_out, structured_writer, flat_writer, nlp,
+            batch_size=batch_size, n_process=n_process, lang_detector=lang_detector,
+            granularity=granularity
+        )
+        # Outputs are written while parsing, so "parse" includes the progressive writes
+        with profile_phase("parse"):
+            for chunk in iter(lambda: source.read(STREAM_READ_SIZE), ""):
+                extractor.feed(chunk)
+            extractor.close()
+        with profile_phase("serialization"):
+            for writer in (structured_writer, flat_writer):
+                if writer is not None:
+                    writer.close()
+
+    if "sentences" in outputs:
+        with profile_phase("serialization"):
+            write_json_output(OUTPUT_FILES["sentences"], group_sentences_by_length(extractor.sentences), json_format)
 
-    with open("non_translatable.html", "w", encoding="utf-8") as f:
-        f.write(str(soup))
-print("✅ Step 1 complete: saved translatable_flat.json, translatable_structured.json, translatable_flat_sentences.json, and non_translatable.html.")
- 
 
 
 if __name__ == "__main__":
@@ -615,11 +1870,257 @@ Supported codes: {SUPPORTED_LANGS}
 Examples: --secondary-lang fr (French), --secondary-lang es (Spanish)"""
     )
 
+    # Model pool tuning (OPTIONAL)
+    parser.add_argument(
+        "--max-models",
+        type=int,
+        default=MODEL_POOL_SIZE,
+        metavar="N",
+        help=f"Maximum number of spaCy models kept loaded at once (default: {MODEL_POOL_SIZE})"
+    )
+    parser.add_argument(
+        "--disable-pipes",
+        default="",
+        metavar="PIPES",
+        help="""\
+Comma-separated spaCy pipes to exclude when loading models.
+Example: --disable-pipes ner,lemmatizer"""
+    )
+
+    # Batched NLP tuning (OPTIONAL)
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=NLP_BATCH_SIZE,
+        metavar="N",
+        help=f"Number of texts per nlp.pipe batch (default: {NLP_BATCH_SIZE})"
+    )
+    parser.add_argument(
+        "--n-process",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Number of worker processes for nlp.pipe (default: 1)"
+    )
+
+    # Language detector (OPTIONAL)
+    parser.add_argument(
+        "--lang-detector",
+        choices=LANG_DETECTORS,
+        default="script",
+        help="""\
+How blocks are routed to spaCy models (default: script).
+  script: script ranges, accents and stop words
+  ngram:  bundled character n-gram profiles (see ngram_langid.py)"""
+    )
+
+    # HTML parser backend (OPTIONAL)
+    parser.add_argument(
+        "--parser",
+        choices=HTML_PARSERS.keys(),
+        default=DEFAULT_PARSER,
+        help="""\
+HTML parser backend (default: html5lib).
+  html5lib:    browser-grade tree building, slowest
+  lxml:        fastest, needs the lxml package
+  html.parser: Python standard library
+Run compare_parsers.py for a fidelity report across backends."""
+    )
+
+    # Streaming mode (OPTIONAL)
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="""\
+Tokenize the HTML incrementally and write outputs as blocks finish.
+Uses bounded memory for very large pages; blocks are numbered in document order."""
+    )
+
+    # Output granularity (OPTIONAL)
+    parser.add_argument(
+        "--granularity",
+        choices=GRANULARITIES,
+        default=DEFAULT_GRANULARITY,
+        help=f"""\
+Level of detail in the outputs (default: {DEFAULT_GRANULARITY}).
+  word:     sentences plus per-word pos, entity, language and pinyin
+  sentence: sentences only; skips the {", ".join(WORD_LEVEL_PIPES)} pipes.
+            Much faster, and step 2 only needs the sentence segments."""
+    )
+
+    # Sentence segmentation engine (OPTIONAL)
+    parser.add_argument(
+        "--segmenter",
+        default=SEGMENTER,
+        help=f"""\
+Sentence boundary engine, for all languages or per language (default: {SEGMENTER}).
+  parser:      dependency parser, most accurate, slowest
+  senter:      statistical sentence recognizer, parser not loaded
+  sentencizer: spaCy punctuation rules
+  regex:       plain regular expression, fastest
+Per language: --segmenter en=sentencizer,fr=parser (unlisted languages use
+parser), or with a default: --segmenter sentencizer,zh=parser.
+Run benchmark_segmenters.py for a recommended setting."""
+    )
+
+    # Persistent segmentation cache (OPTIONAL)
+    parser.add_argument(
+        "--cache",
+        metavar="PATH",
+        help="""\
+SQLite file caching sentence/word results across runs and processes.
+Example: --cache segment_cache.sqlite"""
+    )
+    parser.add_argument(
+        "--cache-size-mb",
+        type=float,
+        default=DEFAULT_MAX_MB,
+        metavar="MB",
+        help=f"Size cap of the cache; least recently used entries are evicted (default: {DEFAULT_MAX_MB})"
+    )
+
+    # Structured output format (OPTIONAL)
+    parser.add_argument(
+        "--structured-format",
+        choices=STRUCTURED_FILES.keys(),
+        default=DEFAULT_STRUCTURED_FORMAT,
+        help=f"""\
+Format of the word-level output (default: {DEFAULT_STRUCTURED_FORMAT}).
+  json:   {STRUCTURED_FILES["json"]}, pretty-printed
+  packed: {STRUCTURED_FILES["packed"]}, columnar and compressed (msgpack/zstd when installed)
+          Convert back with: python artifact_format.py to-json {STRUCTURED_FILES["packed"]}"""
+    )
+
+    # Output selection (OPTIONAL)
+    parser.add_argument(
+        "--outputs",
+        default=",".join(OUTPUTS),
+        metavar="LIST",
+        help=f"""\
+Comma-separated artifacts to write (default: all).
+  flat:       {OUTPUT_FILES["flat"]}
+  structured: {STRUCTURED_FILES["json"]} (or .pack, see --structured-format)
+  sentences:  {OUTPUT_FILES["sentences"]}
+  html:       {OUTPUT_FILES["html"]}
+Example: --outputs flat,sentences,html"""
+    )
+    parser.add_argument(
+        "--json-format",
+        choices=JSON_FORMATS,
+        default=DEFAULT_JSON_FORMAT,
+        help="""\
+JSON layout of the outputs (default: pretty).
+  pretty: indented, as before
+  fast:   compact, serialized with orjson when installed"""
+    )
+
+    # Block ids and incremental runs (OPTIONAL)
+    parser.add_argument(
+        "--block-ids",
+        choices=BLOCK_ID_SCHEMES,
+        default="sequential",
+        help="""\
+How blocks are named (default: sequential).
+  sequential: BLOCK_1, BLOCK_2, ... in extraction order
+  stable:     BLOCK_<hash of DOM path, block type and text>; edits elsewhere
+              on the page leave the ids unchanged"""
+    )
+    parser.add_argument(
+        "--incremental",
+        metavar="MANIFEST",
+        help="""\
+Diff the page against the manifest of the previous run and only run NLP
+for added or edited blocks; the manifest is updated afterwards.
+Implies --block-ids stable. Example: --incremental index.manifest.json"""
+    )
+
+    # Profiling (OPTIONAL)
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const=DEFAULT_PROFILE_FILE,
+        metavar="REPORT",
+        help=f"""\
+Write a JSON report of wall time and call counts per phase (parse, filter,
+language_detection, model_loading, nlp, pinyin, jsonld, serialization),
+peak RSS and the slowest blocks (default: {DEFAULT_PROFILE_FILE}).
+Use --batch-size 1 for exact per-block times."""
+    )
+    parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="Add the tracemalloc peak of the extraction to the --profile report (much slower)"
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=DEFAULT_TOP_BLOCKS,
+        help=f"Number of slowest blocks in the --profile report (default: {DEFAULT_TOP_BLOCKS})"
+    )
+
     args = parser.parse_args()
 
     # Validate language priority
     if args.secondary_lang and args.secondary_lang == args.lang:
         parser.error("Primary and secondary languages cannot be the same!")
 
+    outputs = [name.strip() for name in args.outputs.split(",") if name.strip()]
+    unknown = [name for name in outputs if name not in OUTPUTS]
+    if unknown or not outputs:
+        parser.error(f"--outputs takes a comma-separated list of: {', '.join(OUTPUTS)}")
+    if args.stream and (args.block_ids == "stable" or args.incremental):
+        parser.error("--block-ids stable and --incremental need the tree extractor, not --stream")
+
+    try:
+        parse_segmenter_spec(args.segmenter)
+    except ValueError as e:
+        parser.error(f"--segmenter: {e}")
+
+    if args.profile:
+        configure_profiler(args.profile_top, args.profile_memory)
+
+    disabled_pipes = [p.strip() for p in args.disable_pipes.split(",") if p.strip()]
+    configure_model_pool(max_models=args.max_models, disable=disabled_pipes, segmenter=args.segmenter)
+    configure_segment_cache(args.cache, args.cache_size_mb)
+
     # Run extraction
-    extract_translatable_html(args.input_file, args.lang)
+    if args.stream:
+        extract_translatable_html_streaming(
+            args.input_file,
+            args.lang,
+            args.secondary_lang,
+            batch_size=args.batch_size,
+            n_process=args.n_process,
+            lang_detector=args.lang_detector,
+            granularity=args.granularity,
+            structured_format=args.structured_format,
+            outputs=outputs,
+            json_format=args.json_format
+        )
+    else:
+        extract_translatable_html(
+            args.input_file,
+            args.lang,
+            args.secondary_lang,
+            batch_size=args.batch_size,
+            n_process=args.n_process,
+            lang_detector=args.lang_detector,
+            parser=args.parser,
+            granularity=args.granularity,
+            structured_format=args.structured_format,
+            outputs=outputs,
+            json_format=args.json_format,
+            block_ids=args.block_ids,
+            manifest_path=args.incremental
+        )
+
+    saved = [STRUCTURED_FILES[args.structured_format] if name == "structured" else OUTPUT_FILES[name] for name in outputs]
+    print(f"✅ Step 1 complete: saved {', '.join(saved)}.")
+    report_segment_cache()
+    if args.profile:
+        report = _profiler.write(
+            args.profile,
+            input_file=args.input_file, lang=args.lang, stream=args.stream,
+            granularity=args.granularity, segmenter=args.segmenter, batch_size=args.batch_size
+        )
+        print(f"⏱️ Profile saved: {args.profile} ({report['total_seconds']:.2f}s total)")
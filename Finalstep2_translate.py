@@ -4,6 +4,151 @@ import deepl
 import argparse
 from pathlib import Path
 
+from ngram_langid import identify_languages
+from artifact_format import load_structured
+from translation_memory import open_memory
+
+
+DEEPL_MAX_TEXTS = 50                   # texts per translate_text request (API limit)
+DEEPL_MAX_REQUEST_BYTES = 120 * 1024   # stay below the 128 KiB request body limit
+DETECTION_PREFIX = 100                 # characters sent for remote language detection
+# Offline detection of UI strings ("Resources", "Restaurant") is unreliable:
+# shorter texts, or a weaker lead per n-gram, count as undecided
+DETECTION_MIN_WORDS = 4
+DETECTION_MARGIN_PER_GRAM = 0.1
+# Step 1 codes decided by script ranges; its Latin-script codes come from a
+# stop-word heuristic that checks "en" first ("en 1943" makes French "en")
+SCRIPT_LANGUAGES = {"zh", "ru", "el", "xx"}
+
+
+def chunk_texts(texts, max_texts=DEEPL_MAX_TEXTS, max_bytes=DEEPL_MAX_REQUEST_BYTES):
+    """Split texts into consecutive lists that each fit in one translate_text request."""
+    chunk, size = [], 0
+    for text in texts:
+        text_size = len(text.encode("utf-8"))
+        if chunk and (len(chunk) >= max_texts or size + text_size > max_bytes):
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(text)
+        size += text_size
+    if chunk:
+        yield chunk
+
+
+def translate_texts(translator, texts, target_lang, **options):
+    """
+    Translate a list of texts with as few requests as the API limits allow.
+
+    Returns the TextResult objects in the order of texts.
+    """
+    results = []
+    for chunk in chunk_texts(texts):
+        results.extend(translator.translate_text(chunk, target_lang=target_lang, **options))
+    return results
+
+
+def load_step1_languages(structured_file):
+    """
+    Map block and sentence texts to the language step 1 detected for them.
+
+    Reads translatable_structured.json (or the packed .pack variant). Only
+    explicit codes are kept: "default" just means step 1 found no exception
+    language, and sentence-granularity output has no word records at all.
+    """
+    if structured_file.endswith(".pack"):
+        structured = load_structured(structured_file)
+    else:
+        with open(structured_file, "r", encoding="utf-8") as f:
+            structured = json.load(f)
+
+    text_languages = {}
+    for block_data in structured.values():
+        sentences = block_data.get("tokens", {}).values()
+        language = next(
+            (word["language"] for sentence in sentences for word in sentence.get("words", {}).values()),
+            "default"
+        )
+        if language == "default":
+            continue
+        for sentence in sentences:
+            text_languages[sentence["text"]] = language
+        if "text" in block_data:
+            text_languages[block_data["text"]] = language
+        text_languages.setdefault(" ".join(sentence["text"] for sentence in sentences), language)
+    return text_languages
+
+
+def detect_source_languages(texts, translator, target_lang, text_languages=None,
+                            memory=None, remote_detection=False):
+    """
+    Return one lowercase source language code (or None) per text.
+
+    Each text is decided by the first source that knows it: the offline
+    n-gram detector, an earlier DeepL detection stored in memory, then step
+    1's language data. The n-gram detector only decides texts of
+    DETECTION_MIN_WORDS or more words, and neither it nor step 1's stop-word
+    heuristic decides in favour of the target language: a text is only left
+    untranslated on a script-range label (SCRIPT_LANGUAGES) or a DeepL
+    detection. Texts still undecided go through a DeepL detection request
+    only with remote_detection; only those detections are stored in memory.
+    """
+    target_base = target_lang.split("-")[0].lower()
+    text_languages = text_languages or {}
+
+    guesses = identify_languages(
+        texts,
+        min_words=DETECTION_MIN_WORDS,
+        margin_per_gram=DETECTION_MARGIN_PER_GRAM
+    )
+    languages = [language if language != target_base else None for language in guesses]
+    unknown = [idx for idx, language in enumerate(languages) if language is None]
+    if memory and unknown:
+        detected = memory.get_languages(texts[idx] for idx in unknown)
+        for idx in unknown:
+            languages[idx] = detected.get(texts[idx])
+        unknown = [idx for idx in unknown if languages[idx] is None]
+    for idx in unknown:
+        language = text_languages.get(texts[idx])
+        if language != target_base or language in SCRIPT_LANGUAGES:
+            languages[idx] = language
+
+    ambiguous = [idx for idx, language in enumerate(languages) if language is None]
+    if remote_detection and ambiguous:
+        print(f"Detecting {len(ambiguous)} ambiguous segments remotely...")
+        try:
+            detections = translate_texts(
+                translator,
+                [texts[idx][:DETECTION_PREFIX] for idx in ambiguous],
+                target_lang=target_lang,
+                preserve_formatting=True
+            )
+            for idx, detection in zip(ambiguous, detections):
+                languages[idx] = detection.detected_source_lang.lower()
+            if memory:
+                memory.put_languages((texts[idx], languages[idx]) for idx in ambiguous)
+        except Exception as e:
+            print(f"Remote language detection skipped (error: {str(e)[:50]}...)")
+    return languages
+
+
+def segment_gaps(text, segments):
+    """
+    Return the text around and between the segments of a block, or None.
+
+    segments must appear in text in order; the result has one more entry than
+    segments, so that gaps[0] + seg1 + gaps[1] + ... + gaps[-1] == text.
+    """
+    gaps = []
+    position = 0
+    for segment in segments:
+        start = text.find(segment, position)
+        if start < 0:
+            return None
+        gaps.append(text[position:start])
+        position = start + len(segment)
+    gaps.append(text[position:])
+    return gaps
+
 
 def create_efficient_translatable_map(
     json_data, 
@@ -11,27 +156,33 @@ def create_efficient_translatable_map(
     target_lang="FR", 
     primary_lang=None, 
     secondary_lang=None, 
-    memory_file=None
+    memory=None,
+    text_languages=None,
+    remote_detection=False,
+    segment_only=False
 ):
     """
     Creates a translation map with language validation.
     Only translates text detected as primary_lang or secondary_lang.
-    """
-    # Load translation memory
-    translation_memory = {}
-    if memory_file and os.path.exists(memory_file):
-        try:
-            with open(memory_file, "r", encoding="utf-8") as f:
-                translation_memory = json.load(f)
-            print(f"Loaded {len(translation_memory)} cached translations")
-        except json.JSONDecodeError:
-            print(f"Warning: Corrupted translation memory file {memory_file}")
 
+    memory is a translation_memory.TranslationMemory (or None): hits are read
+    in one lookup and new translations are committed after every batch.
+
+    Languages come from step 1 (text_languages, see load_step1_languages),
+    the offline detector and the DeepL detections stored in memory.
+    Texts no detector can decide are assumed to be in primary_lang unless
+    remote_detection asks DeepL. Every translation request carries an
+    explicit source_lang.
+
+    With segment_only, a block whose text is made of its segments is not sent
+    itself: its translation is rebuilt from the translated segments, keeping
+    the original spacing between them.
+    """
     # Prepare translation data structures
     translatable_map = {}
-    texts_to_translate = []
-    token_indices = []  # Changed to list
-    original_texts = {}
+    text_tokens = {}  # unique text -> every token it has to be written to
+    queued_count = 0
+    rebuilt_blocks = {}  # block_id -> (segment tokens, gaps), see segment_only
 
     # Process all blocks and segments
     for block_id, block_data in json_data.items():
@@ -39,83 +190,116 @@ def create_efficient_translatable_map(
         if "text" in block_data:
             text = block_data["text"]
             token = block_id
-            
-            if text in translation_memory:
-                translatable_map[token] = translation_memory[text]
-                print(f"Using cached: {token}")
+            gaps = None
+            if segment_only and block_data.get("segments"):
+                gaps = segment_gaps(text, list(block_data["segments"].values()))
+
+            if gaps is not None:
+                rebuilt_blocks[token] = (
+                    [f"{block_id}_{segment_id}" for segment_id in block_data["segments"]],
+                    gaps
+                )
             else:
-                texts_to_translate.append(text)
-                token_indices.append(token)  # Append to list
-                original_texts[token] = text
+                text_tokens.setdefault(text, []).append(token)
+                queued_count += 1
 
         # Segments within blocks
         if "segments" in block_data:
             for segment_id, segment_text in block_data["segments"].items():
                 token = f"{block_id}_{segment_id}"
-                
-                if segment_text in translation_memory:
-                    translatable_map[token] = translation_memory[segment_text]
-                    print(f"Using cached segment: {token}")
-                else:
-                    texts_to_translate.append(segment_text)
-                    token_indices.append(token)  # Append to list
-                    original_texts[token] = segment_text
+                text_tokens.setdefault(segment_text, []).append(token)
+                queued_count += 1
+
+    # Each distinct text is looked up and translated once and fanned out to all of its tokens
+    unique_texts = list(text_tokens)
+    if queued_count:
+        print(f"Coalesced {queued_count} segments into {len(unique_texts)} unique texts "
+              f"(dedupe ratio {1 - len(unique_texts) / queued_count:.1%})")
+
+    allowed_langs = {
+        lang.lower() for lang in [primary_lang, secondary_lang] if lang
+    }
+    target_base = target_lang.split("-")[0].lower()
+
+    # The memory is keyed by source language, so languages are decided first
+    text_langs = [None] * len(unique_texts)
+    if unique_texts and allowed_langs:
+        text_langs = detect_source_languages(
+            unique_texts, translator, target_lang,
+            text_languages, memory, remote_detection
+        )
+        text_langs = [lang or (primary_lang or "").lower() or None for lang in text_langs]
+
+    # Translation memory lookup
+    texts_to_translate = []
+    source_langs = []
+    cached = memory.get_many(target_lang, zip(text_langs, unique_texts)) if memory else {}
+    for text, lang in zip(unique_texts, text_langs):
+        translation = cached.get(((lang or ""), text))
+        if translation is None:
+            texts_to_translate.append(text)
+            source_langs.append(lang)
+            continue
+        for token in text_tokens[text]:
+            translatable_map[token] = translation
+    if cached:
+        print(f"Using {len(cached)} cached translations")
 
     # Language-aware batch translation
     if texts_to_translate:
-        print(f"Processing {len(texts_to_translate)} segments with language validation...")
+        print(f"Processing {len(texts_to_translate)} unique segments with language validation...")
         
-        batch_size = 330  # Conservative batch size for detection overhead
+        batch_size = 330  # Texts per translation memory commit
+        stored_count = 0
         for batch_idx in range(0, len(texts_to_translate), batch_size):
             batch = texts_to_translate[batch_idx:batch_idx+batch_size]
-            translated_batch = []
+            batch_langs = source_langs[batch_idx:batch_idx+batch_size]
+            # Texts in other languages, or already in the target language, keep their original text
+            translated_batch = list(batch)
+            memory_rows = []  # only texts DeepL actually translated go into the memory
             
             try:
-                # Phase 1: Batch Language detection
-                detection_results = translator.translate_text(
-                    [text[:100] for text in batch],
-                    target_lang=target_lang,
-                    preserve_formatting=True
-                )
-
-                # Phase 2: Language validation and conditional full translation
-                for idx, detection in enumerate(detection_results):
-                    detected_lang = detection.detected_source_lang.lower()
-                    allowed_langs = {
-                        lang.lower() for lang in [primary_lang, secondary_lang] if lang
-                    }
-
-                    text = batch[idx]
-                    if allowed_langs and detected_lang in allowed_langs:
-                        result = translator.translate_text(
-                            text,
-                            target_lang=target_lang
-                        )
-                        translated_batch.append(result.text)
-                    else:
-                        translated_batch.append(text)
+                # Language validation, then one list request per source language
+                by_source = {}
+                for idx, lang in enumerate(batch_langs):
+                    if lang in allowed_langs and lang != target_base:
+                        by_source.setdefault(lang, []).append(idx)
+                for lang, indices in by_source.items():
+                    results = translate_texts(
+                        translator,
+                        [batch[idx] for idx in indices],
+                        target_lang=target_lang,
+                        source_lang=lang.upper()
+                    )
+                    for idx, result in zip(indices, results):
+                        translated_batch[idx] = result.text
+                        memory_rows.append((lang, batch[idx], result.text))
             except Exception as e:
                 print(f"Translation skipped for batch (error: {str(e)[:50]}...)")
-                translated_batch.extend(batch)
+                translated_batch = list(batch)
+                memory_rows = []
             
             # Store results
-            for j in range(len(batch)):
-                global_index = batch_idx + j
-                token = token_indices[global_index]  # Direct list access
-                original_text = original_texts[token]
-                final_text = translated_batch[j]
-                
-                translatable_map[token] = final_text
-                translation_memory[original_text] = final_text
+            for original_text, final_text in zip(batch, translated_batch):
+                for token in text_tokens[original_text]:
+                    translatable_map[token] = final_text
+            if memory:
+                memory.put_many(target_lang, memory_rows)
+                stored_count += len(memory_rows)
             
             print(f"Completed batch {batch_idx//batch_size + 1}/{(len(texts_to_translate) + batch_size - 1)//batch_size}")
+        if memory:
+            print(f"Added {stored_count} entries to the translation memory")
 
-    # Update translation memory
-    if memory_file and translation_memory:
-        os.makedirs(os.path.dirname(memory_file), exist_ok=True)
-        with open(memory_file, "w", encoding="utf-8") as f:
-            json.dump(translation_memory, f, ensure_ascii=False, indent=2)
-        print(f"Updated translation memory with {len(translation_memory)} entries")
+    # Segment-only mode: block text = translated segments with the original spacing
+    for token, (segment_tokens, gaps) in rebuilt_blocks.items():
+        pieces = [gaps[0]]
+        for segment_token, gap in zip(segment_tokens, gaps[1:]):
+            pieces.append(translatable_map[segment_token])
+            pieces.append(gap)
+        translatable_map[token] = "".join(pieces)
+    if rebuilt_blocks:
+        print(f"Rebuilt {len(rebuilt_blocks)} block texts from their segments")
 
     return translatable_map
 
@@ -127,7 +311,10 @@ def translate_json_file(
     primary_lang=None, 
     secondary_lang=None, 
     memory_dir="translation_memory",
-    segment_file=None
+    segment_file=None,
+    structured_file=None,
+    remote_detection=False,
+    segment_only=False
 ):
     """Main translation function with language validation"""
     # Auth check
@@ -140,7 +327,14 @@ def translate_json_file(
     
     # Create memory directory
     os.makedirs(memory_dir, exist_ok=True)
-    memory_file = os.path.join(memory_dir, f"translation_memory_{target_lang.lower()}.json")
+
+    # Step 1 language data (optional)
+    text_languages = None
+    if structured_file:
+        try:
+            text_languages = load_step1_languages(structured_file)
+        except Exception as e:
+            raise ValueError(f"Failed to load {structured_file}: {e}")
 
     # Load input data
     try:
@@ -149,15 +343,22 @@ def translate_json_file(
     except Exception as e:
         raise ValueError(f"Failed to load {input_file}: {e}")
 
-    # Create translation map
-    translatable_map = create_efficient_translatable_map(
-        json_data=json_data,
-        translator=translator,
-        target_lang=target_lang,
-        primary_lang=primary_lang,
-        secondary_lang=secondary_lang,
-        memory_file=memory_file
-    )
+    # Create translation map (translation_memory_{lang}.json files are migrated on first use)
+    memory = open_memory(memory_dir)
+    try:
+        translatable_map = create_efficient_translatable_map(
+            json_data=json_data,
+            translator=translator,
+            target_lang=target_lang,
+            primary_lang=primary_lang,
+            secondary_lang=secondary_lang,
+            memory=memory,
+            text_languages=text_languages,
+            remote_detection=remote_detection,
+            segment_only=segment_only
+        )
+    finally:
+        memory.close()
 
     # Rebuild structure with translations
     translated_data = {}
@@ -248,6 +449,14 @@ def main():
                        help="Apply translations to original structure")
     parser.add_argument("--segments", "-s", 
                        help="Output file for segment-only translations")
+    parser.add_argument("--structured",
+                       help="Step 1 translatable_structured.json (or .pack) whose language data is reused")
+    parser.add_argument("--remote-detect", action="store_true",
+                       help="Ask DeepL for the language of segments the local detector cannot decide "
+                            "(default: assume the primary language)")
+    parser.add_argument("--segment-only", action="store_true",
+                       help="Translate only the segments and rebuild each block text from them "
+                            "(about half the billed characters)")
 
     args = parser.parse_args()
 
@@ -259,7 +468,10 @@ def main():
             primary_lang=args.primary_lang,
             secondary_lang=args.secondary_lang,
             memory_dir=args.memory,
-            segment_file=args.segments
+            segment_file=args.segments,
+            structured_file=args.structured,
+            remote_detection=args.remote_detect,
+            segment_only=args.segment_only
         )
 
         if args.apply:
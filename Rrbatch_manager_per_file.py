@@ -4,14 +4,25 @@ import subprocess
 from pathlib import Path
 import argparse
 
+from Finalstep1_extract import (
+    extract_translatable, extract_translatable_html_streaming,
+    configure_segment_cache, report_segment_cache
+)
+
 UPLOAD_DIR = "uploaded_files"
 PROCESSED_DIR = "processed_files"
 CHARACTER_LIMIT_PRE = 100000
 CHARACTER_LIMIT_POST = 40000
+# Finalstep2_translate_unified.py has no --structured option, so the step 1
+# language data (translatable_structured) is not written for it
+STEP1_OUTPUTS = ("flat", "sentences", "html")
 
 def estimate_html_size(path):
+    size = 0
     with open(path, "r", encoding="utf-8") as f:
-        return len(f.read())
+        for chunk in iter(lambda: f.read(1 << 20), ""):
+            size += len(chunk)
+    return size
 
 def count_json_text_chars(json_path):
     with open(json_path, "r", encoding="utf-8") as f:
@@ -22,19 +33,21 @@ def count_json_text_chars(json_path):
         for block in data.values()
     )
 
-def run_extraction(file_path, lang, base_name):
+def configure_extraction(cache=None):
+    """Step 1 runs in this process, so models and the segment cache stay warm across files."""
+    configure_segment_cache(cache)
+
+def run_extraction(file_path, lang, base_name, stream=False, granularity="word"):
     print(f"Running extraction for {file_path}")
-    result = subprocess.run([
-        "python", "Finalstep1_extract.py",
-        file_path,
-        "--lang", lang
-    ])
-    if result.returncode != 0:
-        raise RuntimeError(f"Extraction failed for {file_path}")
+    if not stream:
+        result = extract_translatable(Path(file_path), lang, granularity=granularity)
+        result.write(".", STEP1_OUTPUTS, suffix=f"_{base_name}")
+        return
+
+    extract_translatable_html_streaming(file_path, lang, granularity=granularity, outputs=STEP1_OUTPUTS)
     # Rename intermediate files to preserve per-file outputs
-    Path("translatable_flat.json").rename(f"translatable_flat_{base_name}.json")
-    Path("translatable_structured.json").rename(f"translatable_structured_{base_name}.json")
-    Path("translatable_flat_sentences.json").rename(f"translatable_flat_sentences_{base_name}.json")
+    for name in ("translatable_flat", "translatable_flat_sentences"):
+        Path(f"{name}.json").rename(f"{name}_{base_name}.json")
     Path("non_translatable.html").rename(f"non_translatable_{base_name}.html")
 
 def run_translation(base_name, lang, primary_lang, secondary_lang, memory_dir):
@@ -68,11 +81,15 @@ def get_args():
     parser.add_argument("--primary-lang", required=True, help="Primary source language")
     parser.add_argument("--secondary-lang", help="Optional secondary source language")
     parser.add_argument("--memory", default="translation_memory", help="Translation memory folder")
+    parser.add_argument("--granularity", choices=["word", "sentence"], default="word",
+                        help="Step 1 output detail; sentence skips the word-level analysis")
+    parser.add_argument("--segment-cache", help="Step 1 segmentation cache file shared across pages and runs")
     return parser.parse_args()
 
 def main():
     args = get_args()
     ensure_dirs()
+    configure_extraction(args.segment_cache)
     all_files = sorted(Path(UPLOAD_DIR).glob("*.html"))
 
     if not all_files:
@@ -82,15 +99,17 @@ def main():
     for file in all_files:
         base_name = file.stem
         est_size = estimate_html_size(file)
-        if est_size > CHARACTER_LIMIT_PRE:
-            print(f"Skipping {file.name} – estimated {est_size} chars exceeds pre-extraction limit.")
-            continue
+        stream = est_size > CHARACTER_LIMIT_PRE
+        if stream:
+            print(f"Streaming {file.name} – estimated {est_size} chars exceeds pre-extraction limit.")
 
         try:
-            run_extraction(str(file), args.primary_lang, base_name)
+            run_extraction(str(file), args.primary_lang, base_name, stream=stream,
+                           granularity=args.granularity)
             json_path = f"translatable_flat_{base_name}.json"
             post_char_count = count_json_text_chars(json_path)
-            if post_char_count > CHARACTER_LIMIT_POST:
+            # Streamed pages are large by definition; the post-extraction limit only guards tree-extracted ones
+            if not stream and post_char_count > CHARACTER_LIMIT_POST:
                 print(f"Skipping {file.name} – extracted JSON has {post_char_count} chars, exceeds limit.")
                 continue
 
@@ -101,5 +120,7 @@ def main():
         except Exception as e:
             print(f"❌ Error processing {file.name}: {str(e)}")
 
+    report_segment_cache()
+
 if __name__ == "__main__":
     main()
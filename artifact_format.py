@@ -0,0 +1,284 @@
+"""
+Compact columnar format for translatable_structured.json.
+
+Blocks are written in frames as they finish. Every frame holds the new
+entries of a shared string table (POS tags, entity labels, languages,
+pinyin, block types) and its blocks in columnar form: per sentence the text,
+the token texts and one table index per token for pos, language, entity and
+pinyin. Frames are encoded with msgpack and compressed with zstd when those
+packages are installed, otherwise with compact JSON and zlib; the codecs
+used are recorded in the file header.
+
+load_structured() returns exactly the dict json.load gives for
+translatable_structured.json.
+
+File layout:
+    MAGIC, encoding byte (b"m" msgpack / b"j" json), compression byte (b"z" zstd / b"d" zlib)
+    then per frame: payload length (4 bytes, little endian) and compressed payload
+
+Usage:
+    python artifact_format.py to-json translatable_structured.pack [-o translatable_structured.json]
+    python artifact_format.py compare [tests/Finaltranslatable_structured.json ...]
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import struct
+import argparse
+
+try:
+    import msgpack
+except ImportError:  # compact JSON is used instead
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # zlib is used instead
+    zstandard = None
+
+
+MAGIC = b"TSPACK1\n"
+FRAME_BLOCKS = 256       # blocks per frame
+ZSTD_LEVEL = 10
+ZLIB_LEVEL = 6
+WORD_FIELDS = ("text", "pos", "language", "ent", "pinyin")
+
+_LENGTH = struct.Struct("<I")
+
+
+def _codecs(encoding=None, compression=None):
+    encoding = encoding or (b"m" if msgpack is not None else b"j")
+    compression = compression or (b"z" if zstandard is not None else b"d")
+    if encoding == b"m" and msgpack is None:
+        raise RuntimeError("This file is msgpack encoded; install msgpack to read it.")
+    if compression == b"z" and zstandard is None:
+        raise RuntimeError("This file is zstd compressed; install zstandard to read it.")
+
+    if encoding == b"m":
+        encode = lambda obj: msgpack.packb(obj, use_bin_type=True)
+        decode = lambda data: msgpack.unpackb(data, raw=False)
+    else:
+        encode = lambda obj: json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        decode = lambda data: json.loads(data.decode("utf-8"))
+
+    if compression == b"z":
+        compress = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress
+        decompress = zstandard.ZstdDecompressor().decompress
+    else:
+        compress = lambda data: zlib.compress(data, ZLIB_LEVEL)
+        decompress = zlib.decompress
+    return encoding, compression, encode, decode, compress, decompress
+
+
+def _is_columnar(tokens):
+    """True when every sentence has the shape build_block_records produces."""
+    for s_idx, (s_key, sentence) in enumerate(tokens.items(), 1):
+        if s_key != f"S{s_idx}" or "text" not in sentence:
+            return False
+        if list(sentence) not in (["text"], ["text", "words"]):
+            return False
+        for w_idx, (w_key, word) in enumerate(sentence.get("words", {}).items(), 1):
+            if w_key != f"W{w_idx}" or tuple(word) != WORD_FIELDS:
+                return False
+    return True
+
+
+class ArtifactWriter:
+    """
+    Write structured blocks to a packed file as they finish.
+
+    Same interface as JsonObjectStreamWriter: write(block_id, block_data), close().
+    """
+
+    def __init__(self, f, frame_blocks=FRAME_BLOCKS):
+        self.f = f
+        self.frame_blocks = frame_blocks
+        encoding, compression, self._encode, _, self._compress, _ = _codecs()
+        self.f.write(MAGIC + encoding + compression)
+        self.table = {None: 0}
+        self.new_strings = []
+        self.blocks = []
+
+    def _intern(self, value):
+        index = self.table.get(value)
+        if index is None:
+            index = self.table[value] = len(self.table)
+            self.new_strings.append(value)
+        return index
+
+    def _encode_block(self, block_id, block_data):
+        tokens = block_data.get("tokens")
+        header = [(key, value) for key, value in block_data.items() if key != "tokens"]
+        if (
+            not isinstance(tokens, dict) or
+            not _is_columnar(tokens) or
+            not all(isinstance(value, str) for _, value in header)
+        ):
+            return [block_id, "raw", block_data]
+
+        sentences = []
+        for sentence in tokens.values():
+            if "words" not in sentence:
+                sentences.append([sentence["text"]])
+                continue
+            words = list(sentence["words"].values())
+            sentences.append([
+                sentence["text"],
+                [word["text"] for word in words],
+                [self._intern(word["pos"]) for word in words],
+                [self._intern(word["language"]) for word in words],
+                [self._intern(word["ent"]) for word in words],
+                [self._intern(word["pinyin"]) for word in words],
+            ])
+        header = [[self._intern(key), self._intern(value)] for key, value in header]
+        return [block_id, header, sentences]
+
+    def write(self, block_id, block_data):
+        self.blocks.append(self._encode_block(block_id, block_data))
+        if len(self.blocks) >= self.frame_blocks:
+            self.flush()
+
+    def flush(self):
+        if not self.blocks:
+            return
+        payload = self._compress(self._encode({"strings": self.new_strings, "blocks": self.blocks}))
+        self.f.write(_LENGTH.pack(len(payload)))
+        self.f.write(payload)
+        self.new_strings = []
+        self.blocks = []
+
+    def close(self):
+        self.flush()
+
+
+def iter_structured(f):
+    """Yield (block_id, block_data) from a packed file object, frame by frame."""
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a packed translatable_structured file")
+    codec = f.read(2)
+    _, _, _, decode, _, decompress = _codecs(codec[:1], codec[1:])
+
+    table = [None]
+    while True:
+        size = f.read(_LENGTH.size)
+        if not size:
+            return
+        frame = decode(decompress(f.read(_LENGTH.unpack(size)[0])))
+        table.extend(frame["strings"])
+        for block_id, header, sentences in frame["blocks"]:
+            if header == "raw":
+                yield block_id, sentences
+                continue
+            block_data = {table[key]: table[value] for key, value in header}
+            tokens = {}
+            for s_idx, sentence in enumerate(sentences, 1):
+                if len(sentence) == 1:
+                    tokens[f"S{s_idx}"] = {"text": sentence[0]}
+                    continue
+                text, texts, pos, language, ent, pinyin = sentence
+                tokens[f"S{s_idx}"] = {
+                    "text": text,
+                    "words": {
+                        f"W{i + 1}": {
+                            "text": word,
+                            "pos": table[pos[i]],
+                            "language": table[language[i]],
+                            "ent": table[ent[i]],
+                            "pinyin": table[pinyin[i]]
+                        }
+                        for i, word in enumerate(texts)
+                    }
+                }
+            block_data["tokens"] = tokens
+            yield block_id, block_data
+
+
+def load_structured(path):
+    """Load a packed file into the translatable_structured.json dict."""
+    with open(path, "rb") as f:
+        return dict(iter_structured(f))
+
+
+def dump_structured(structured, path):
+    with open(path, "wb") as f:
+        writer = ArtifactWriter(f)
+        for block_id, block_data in structured.items():
+            writer.write(block_id, block_data)
+        writer.close()
+
+
+# Comparison -------------------------------------------------------
+def best_time(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def compare_formats(json_path, scratch_dir, repeat=5):
+    """Size and write/read time of pretty JSON, compact JSON and the packed format."""
+    with open(json_path, "r", encoding="utf-8") as f:
+        structured = json.load(f)
+
+    base = os.path.join(scratch_dir, os.path.splitext(os.path.basename(json_path))[0])
+    variants = {
+        "json (indent=2)": (base + ".json", lambda path: json.dump(
+            structured, open(path, "w", encoding="utf-8"), indent=2, ensure_ascii=False)),
+        "json (compact)": (base + ".min.json", lambda path: json.dump(
+            structured, open(path, "w", encoding="utf-8"), separators=(",", ":"), ensure_ascii=False)),
+        "packed": (base + ".pack", lambda path: dump_structured(structured, path)),
+    }
+
+    results = {}
+    for name, (path, write) in variants.items():
+        write_ms = best_time(lambda: write(path), repeat)
+        if name == "packed":
+            read = lambda: load_structured(path)
+        else:
+            read = lambda: json.load(open(path, "r", encoding="utf-8"))
+        read_ms = best_time(read, repeat)
+        results[name] = {
+            "bytes": os.path.getsize(path),
+            "write_ms": round(write_ms, 2),
+            "read_ms": round(read_ms, 2),
+            "round_trip": read() == structured,
+        }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Packed translatable_structured format.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    to_json = commands.add_parser("to-json", help="Convert a packed file back to translatable_structured.json")
+    to_json.add_argument("input", help="Packed file")
+    to_json.add_argument("--output", "-o", default="translatable_structured.json", help="JSON file to write")
+
+    compare = commands.add_parser("compare", help="Size and speed against JSON on structured fixtures")
+    compare.add_argument("inputs", nargs="*", default=[os.path.join("tests", "Finaltranslatable_structured.json")],
+                         help="translatable_structured.json files")
+    compare.add_argument("--repeat", type=int, default=5, help="Timing repetitions")
+
+    args = parser.parse_args()
+
+    if args.command == "to-json":
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(load_structured(args.input), f, indent=2, ensure_ascii=False)
+        print(f"✅ Wrote {args.output}")
+        sys.exit(0)
+
+    import tempfile
+    codecs = f"{'msgpack' if msgpack else 'json'} + {'zstd' if zstandard else 'zlib'}"
+    with tempfile.TemporaryDirectory() as scratch:
+        for json_path in args.inputs:
+            results = compare_formats(json_path, scratch, args.repeat)
+            baseline = results["json (indent=2)"]["bytes"]
+            print(f"\n{json_path} (packed codecs: {codecs})")
+            print(f"{'format':<16} {'bytes':>10} {'ratio':>7} {'write ms':>9} {'read ms':>8} {'round trip':>10}")
+            for name, row in results.items():
+                print(f"{name:<16} {row['bytes']:>10,} {row['bytes'] / baseline:>7.1%} "
+                      f"{row['write_ms']:>9.1f} {row['read_ms']:>8.1f} {str(row['round_trip']):>10}")
@@ -0,0 +1,151 @@
+"""
+Speed and boundary-agreement report for the step 1 sentence segmenters.
+
+Collects the translatable blocks of the fixtures, segments them
+with every --segmenter engine and compares the sentence boundaries with the
+parser baseline. For each language the cheapest engine whose boundary F1
+stays above --threshold is recommended.
+
+Usage:
+    python benchmark_segmenters.py [--threshold 0.95] [--repeat 3] [--report segmenters.json]
+"""
+import os
+import json
+import time
+import argparse
+
+from bs4 import BeautifulSoup
+
+from Finalstep1_extract import (
+    SPACY_MODELS, SEGMENTERS, configure_model_pool, load_spacy_model,
+    iter_nodes_with_translate, is_translatable_text, NavigableString
+)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE = "parser"
+
+
+def load_blocks():
+    """
+    Collect {lang: [block text]} from the repository fixtures.
+
+    - tests/Finaltranslatable_flat.json block texts are English
+    - uploaded_files/*.html translatable text nodes use <html lang>
+      (tests/ only holds step 1 outputs, whose HTML is placeholders)
+    """
+    blocks = {}
+    tests_dir = os.path.join(BASE_DIR, "tests")
+    with open(os.path.join(tests_dir, "Finaltranslatable_flat.json"), "r", encoding="utf-8") as f:
+        for block in json.load(f).values():
+            if block.get("text", "").strip():
+                blocks.setdefault("en", []).append(block["text"])
+
+    upload_dir = os.path.join(BASE_DIR, "uploaded_files")
+    for filename in sorted(os.listdir(upload_dir)):
+        if not filename.endswith(".html"):
+            continue
+        with open(os.path.join(upload_dir, filename), "r", encoding="utf-8") as f:
+            soup = BeautifulSoup(f, "html5lib")
+        page_lang = ((soup.html.get("lang") if soup.html else None) or "en").split("-")[0].lower()
+        if page_lang not in SPACY_MODELS:
+            page_lang = "xx"
+        for node, translate_override in iter_nodes_with_translate(soup):
+            if isinstance(node, NavigableString) and is_translatable_text(node, translate_override):
+                blocks.setdefault(page_lang, []).append(node.strip())
+    return blocks
+
+
+def sentence_boundaries(doc):
+    """Character offsets where a sentence other than the first one starts."""
+    return {sent.start_char for sent in doc.sents if sent.start_char > 0}
+
+
+def run_segmenter(segmenter, lang, texts, repeat=3):
+    """Return the boundary sets of texts and the best run time in seconds."""
+    configure_model_pool(segmenter=segmenter)
+    nlp = load_spacy_model(lang)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        docs = list(nlp.pipe(texts))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return [sentence_boundaries(doc) for doc in docs], best
+
+
+def agreement(baseline, candidate):
+    """Micro precision/recall/F1 of candidate boundaries, plus the share of identically split blocks."""
+    matched = sum(len(b & c) for b, c in zip(baseline, candidate))
+    predicted = sum(len(c) for c in candidate)
+    expected = sum(len(b) for b in baseline)
+    precision = matched / predicted if predicted else 1.0
+    recall = matched / expected if expected else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    identical = sum(b == c for b, c in zip(baseline, candidate)) / len(baseline) if baseline else 1.0
+    return precision, recall, f1, identical
+
+
+def benchmark_language(lang, texts, repeat=3):
+    results = {}
+    baseline = None
+    for segmenter in SEGMENTERS:
+        boundaries, elapsed = run_segmenter(segmenter, lang, texts, repeat)
+        if baseline is None:
+            baseline = boundaries
+        sentences = sum(len(b) + 1 for b in boundaries)
+        precision, recall, f1, identical = agreement(baseline, boundaries)
+        results[segmenter] = {
+            "sentences": sentences,
+            "sentences_per_second": round(sentences / elapsed, 1) if elapsed else float("inf"),
+            "boundary_precision": round(precision, 4),
+            "boundary_recall": round(recall, 4),
+            "boundary_f1": round(f1, 4),
+            "identical_blocks": round(identical, 4),
+        }
+    return results
+
+
+def recommend(results, threshold):
+    """Fastest engine whose boundary F1 against the parser is at least threshold."""
+    eligible = [name for name, row in results.items() if row["boundary_f1"] >= threshold]
+    return max(eligible, key=lambda name: results[name]["sentences_per_second"], default=BASELINE)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare sentence segmenters against the parser baseline.")
+    parser.add_argument("--threshold", type=float, default=0.95,
+                        help="Minimum boundary F1 against the parser for a recommendation (default: 0.95)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repetitions")
+    parser.add_argument("--report", help="Optional path for a JSON report")
+    args = parser.parse_args()
+
+    report = {}
+    for lang, texts in sorted(load_blocks().items()):
+        results = benchmark_language(lang, texts, args.repeat)
+        report[lang] = {
+            "blocks": len(texts),
+            "recommended": recommend(results, args.threshold),
+            "segmenters": results,
+        }
+
+    print(f"\n{'lang':<5} {'segmenter':<12} {'sentences/s':>12} {'precision':>9} {'recall':>7} "
+          f"{'F1':>6} {'same split':>10}")
+    for lang, entry in report.items():
+        for name, row in entry["segmenters"].items():
+            marker = " *" if name == entry["recommended"] else ""
+            print(f"{lang:<5} {name:<12} {row['sentences_per_second']:>12,.0f} {row['boundary_precision']:>9.2%} "
+                  f"{row['boundary_recall']:>7.2%} {row['boundary_f1']:>6.2%} "
+                  f"{row['identical_blocks']:>10.2%}{marker}")
+    print(f"* fastest engine with boundary F1 >= {args.threshold:.0%} ({len(report)} languages)")
+    spec = ",".join(f"{lang}={entry['recommended']}" for lang, entry in report.items())
+    print(f"Step 1 setting: --segmenter {spec}")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"✅ Segmenter report saved: {args.report}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
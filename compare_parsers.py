@@ -0,0 +1,115 @@
+"""
+Fidelity and speed report for the step 1 HTML parser backends.
+
+Runs Finalstep1_extract.py on every uploaded_files/*.html page with each
+available --parser backend and compares the extracted blocks and the
+placeholder HTML against the html5lib baseline.
+
+Usage:
+    python compare_parsers.py --lang en [--input-dir uploaded_files] [--report parsers.json]
+"""
+import json
+import time
+import difflib
+import argparse
+from pathlib import Path
+
+from Finalstep1_extract import (
+    HTML_PARSERS, DEFAULT_PARSER, SPACY_MODELS, extract_translatable
+)
+
+
+def time_parse_and_serialize(engine, html_path, repeat=3):
+    """Return the best parse and serialize times in milliseconds."""
+    with open(html_path, "r", encoding="utf-8") as f:
+        source = f.read()
+    parse_times, serialize_times = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        soup = engine.parse(source)
+        parse_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        engine.serialize(soup)
+        serialize_times.append(time.perf_counter() - start)
+    return min(parse_times) * 1000, min(serialize_times) * 1000
+
+
+def run_backend(parser, html_path, lang):
+    """Run a full extraction in memory and return its artifacts."""
+    start = time.perf_counter()
+    result = extract_translatable(Path(html_path), lang, parser=parser)
+    flat, placeholder_html = result.flat, result.html
+    elapsed = time.perf_counter() - start
+    return flat, placeholder_html, elapsed
+
+
+def block_sequence(flat):
+    return [(block["type"], block["text"]) for block in flat.values()]
+
+
+def compare_page(html_path, lang, parsers):
+    results = {}
+    baseline = None
+    for parser in parsers:
+        engine = HTML_PARSERS[parser]
+        flat, placeholder_html, elapsed = run_backend(parser, html_path, lang)
+        parse_ms, serialize_ms = time_parse_and_serialize(engine, html_path)
+        blocks = block_sequence(flat)
+        if baseline is None:
+            baseline = (blocks, placeholder_html)
+
+        matcher = difflib.SequenceMatcher(a=baseline[0], b=blocks, autojunk=False)
+        matching = sum(size for _, _, size in matcher.get_matching_blocks())
+        results[parser] = {
+            "blocks": len(blocks),
+            "blocks_matching_baseline": matching,
+            "identical_blocks": blocks == baseline[0],
+            "identical_placeholder_html": placeholder_html == baseline[1],
+            "html_similarity": round(
+                difflib.SequenceMatcher(a=baseline[1], b=placeholder_html, autojunk=False).quick_ratio(), 4
+            ),
+            "parse_ms": round(parse_ms, 2),
+            "serialize_ms": round(serialize_ms, 2),
+            "extract_s": round(elapsed, 3),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare step 1 output across HTML parser backends.")
+    parser.add_argument("--lang", choices=SPACY_MODELS.keys(), default="en",
+                        help="Primary language passed to the extractor")
+    parser.add_argument("--input-dir", default="uploaded_files", help="Folder with the HTML pages")
+    parser.add_argument("--report", help="Optional path for a JSON report")
+    args = parser.parse_args()
+
+    parsers = [DEFAULT_PARSER] + [
+        name for name, engine in HTML_PARSERS.items()
+        if name != DEFAULT_PARSER and engine.available()
+    ]
+    pages = sorted(Path(args.input_dir).glob("*.html"))
+    if not pages:
+        print(f"No HTML files found in {args.input_dir}/")
+        return 1
+
+    report = {}
+    for page in pages:
+        report[page.name] = compare_page(page, args.lang, parsers)
+
+    print(f"\n{'page':<28} {'parser':<12} {'blocks':>6} {'match':>6} {'same html':>9} "
+          f"{'parse ms':>9} {'serialize ms':>12} {'extract s':>9}")
+    for page_name, results in report.items():
+        for name, row in results.items():
+            print(f"{page_name:<28} {name:<12} {row['blocks']:>6} {row['blocks_matching_baseline']:>6} "
+                  f"{str(row['identical_placeholder_html']):>9} {row['parse_ms']:>9.1f} "
+                  f"{row['serialize_ms']:>12.1f} {row['extract_s']:>9.2f}")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"✅ Parser report saved: {args.report}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,326 @@
+"""
+Offline character n-gram language identifier.
+
+Compact profiles for the SPACY_MODELS languages are bundled in
+langid_profiles.json: the most frequent character 1-3 grams of each language
+with their log-probabilities. The bundled file is derived from the Wikipedia
+n-gram frequencies of the langdetect package (Apache License 2.0).
+
+Scoring is a naive Bayes sum over the n-grams of a string; identify_languages
+scores a whole list at once and uses numpy matrix products when available.
+
+Usage:
+    python ngram_langid.py build --langdetect DIR   # rebuild from langdetect/profiles
+    python ngram_langid.py build CORPUS_DIR         # rebuild from <lang>.txt files
+    python ngram_langid.py benchmark                # accuracy and speed vs. the step 1 heuristics
+"""
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import regex as re
+
+try:
+    import numpy as np
+except ImportError:  # pure-Python scoring is used instead
+    np = None
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROFILE_FILE = os.path.join(BASE_DIR, "langid_profiles.json")
+
+# SPACY_MODELS languages with a profile ("xx" is the multilingual fallback)
+LANGUAGES = ("en", "zh", "fr", "es", "de", "it", "pt", "ru", "el")
+LANGDETECT_NAMES = {"zh": "zh-cn"}
+
+NGRAM_ORDERS = (1, 2, 3)
+PROFILE_SIZE = 600   # n-grams kept per language
+MIN_LETTERS = 4      # shorter strings are left undecided
+MIN_MARGIN = 3.0     # log-score lead (nats) required over the runner-up
+BATCH_CHUNK = 512    # strings scored per matrix product
+
+_NON_LETTERS = re.compile(r'[^\p{L}]+')
+
+
+def extract_ngrams(text):
+    """Count the character n-grams of text (letters only, lowercased, space padded)."""
+    letters = _NON_LETTERS.sub(" ", text.lower()).strip()
+    grams = {}
+    if not letters:
+        return grams
+    padded = f" {letters} "
+    for n in NGRAM_ORDERS:
+        for i in range(len(padded) - n + 1):
+            gram = padded[i:i + n]
+            if gram.strip():
+                grams[gram] = grams.get(gram, 0) + 1
+    return grams
+
+
+def profile_from_counts(counts, profile_size=PROFILE_SIZE):
+    """Keep the most frequent n-grams as log-probabilities."""
+    total = sum(counts.values())
+    top = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:profile_size]
+    grams = {gram: round(math.log(count / total), 3) for gram, count in top}
+    # Unseen n-grams score a little below the rarest one that was kept
+    return {"floor": round(min(grams.values()) - math.log(2), 3), "grams": grams}
+
+
+def build_profiles(corpus_dir, profile_size=PROFILE_SIZE):
+    """Build profiles from plain-text files named <lang>.txt in corpus_dir."""
+    profiles = {}
+    for filename in sorted(os.listdir(corpus_dir)):
+        lang, ext = os.path.splitext(filename)
+        if ext != ".txt":
+            continue
+        with open(os.path.join(corpus_dir, filename), "r", encoding="utf-8") as f:
+            counts = extract_ngrams(f.read())
+        if counts:
+            profiles[lang] = profile_from_counts(counts, profile_size)
+    return profiles
+
+
+def build_profiles_from_langdetect(profile_dir, profile_size=PROFILE_SIZE):
+    """Build profiles from the n-gram frequency files shipped with the langdetect package."""
+    profiles = {}
+    for lang in LANGUAGES:
+        path = os.path.join(profile_dir, LANGDETECT_NAMES.get(lang, lang))
+        if not os.path.exists(path):
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            frequencies = json.load(f)["freq"]
+
+        counts = {}
+        for gram, count in frequencies.items():
+            gram = gram.lower()
+            if gram.strip():
+                counts[gram] = counts.get(gram, 0) + count
+        profiles[lang] = profile_from_counts(counts, profile_size)
+    return profiles
+
+
+class NgramLanguageIdentifier:
+    """Scores strings against the bundled n-gram profiles."""
+
+    def __init__(self, profiles=None):
+        if profiles is None:
+            with open(PROFILE_FILE, "r", encoding="utf-8") as f:
+                profiles = json.load(f)
+
+        self.languages = sorted(profiles)
+        self.floor = [profiles[lang]["floor"] for lang in self.languages]
+
+        vocabulary = sorted({gram for lang in self.languages for gram in profiles[lang]["grams"]})
+        self.index = {gram: i for i, gram in enumerate(vocabulary)}
+        self.weights = {
+            gram: [profiles[lang]["grams"].get(gram, profiles[lang]["floor"]) for lang in self.languages]
+            for gram in vocabulary
+        }
+
+        self._matrix = None
+        if np is not None:
+            # One row per vocabulary n-gram plus a final row for unseen n-grams
+            self._matrix = np.array(
+                [self.weights[gram] for gram in vocabulary] + [self.floor], dtype=np.float64
+            )
+
+    def scores(self, text):
+        """Return {lang: log score} and the number of n-grams scored."""
+        totals = [0.0] * len(self.languages)
+        grams = extract_ngrams(text)
+        for gram, count in grams.items():
+            row = self.weights.get(gram, self.floor)
+            for i, weight in enumerate(row):
+                totals[i] += count * weight
+        return dict(zip(self.languages, totals)), sum(grams.values())
+
+    def _decide(self, ranked, n_grams, text, min_words=1, margin_per_gram=0.0):
+        if n_grams == 0 or len(_NON_LETTERS.sub("", text)) < MIN_LETTERS:
+            return None
+        if min_words > 1 and len(text.split()) < min_words:
+            return None
+        (best_lang, best), (_, runner_up) = ranked[0], ranked[1]
+        if best - runner_up < max(MIN_MARGIN, margin_per_gram * n_grams):
+            return None
+        return best_lang
+
+    def identify(self, text, min_words=1, margin_per_gram=0.0):
+        """
+        Return the most likely language code, or None when undecided.
+
+        min_words and margin_per_gram make the decision stricter: strings with
+        fewer words are left undecided, and the lead over the runner-up must
+        grow with the number of n-grams scored.
+        """
+        totals, n_grams = self.scores(text)
+        ranked = sorted(totals.items(), key=lambda item: -item[1])
+        return self._decide(ranked, n_grams, text, min_words, margin_per_gram)
+
+    def identify_batch(self, texts, min_words=1, margin_per_gram=0.0):
+        """Identify many strings at once; returns one code (or None) per string (see identify)."""
+        if self._matrix is None:
+            return [self.identify(text, min_words, margin_per_gram) for text in texts]
+
+        results = []
+        unseen = len(self.index)
+        for start in range(0, len(texts), BATCH_CHUNK):
+            chunk = texts[start:start + BATCH_CHUNK]
+            rows, columns, values = [], [], []
+            index = self.index
+            for row, text in enumerate(chunk):
+                grams = extract_ngrams(text)
+                rows.extend([row] * len(grams))
+                columns.extend(index.get(gram, unseen) for gram in grams)
+                values.extend(grams.values())
+
+            counts = np.zeros((len(chunk), unseen + 1), dtype=np.float64)
+            np.add.at(counts, (rows, columns), values)
+
+            scores = counts @ self._matrix
+            n_grams = counts.sum(axis=1)
+            order = np.argsort(-scores, axis=1)[:, :2]
+            for row, text in enumerate(chunk):
+                ranked = [(self.languages[i], scores[row, i]) for i in order[row]]
+                results.append(self._decide(ranked, n_grams[row], text, min_words, margin_per_gram))
+        return results
+
+
+_identifier = None
+
+
+def get_identifier():
+    """Return the process-wide identifier, loading the bundled profiles on first use."""
+    global _identifier
+    if _identifier is None:
+        _identifier = NgramLanguageIdentifier()
+    return _identifier
+
+
+def identify_language(text):
+    return get_identifier().identify(text)
+
+
+def identify_languages(texts, min_words=1, margin_per_gram=0.0):
+    return get_identifier().identify_batch(list(texts), min_words, margin_per_gram)
+
+
+# Benchmark --------------------------------------------------------
+def load_benchmark_samples():
+    """
+    Collect (text, language) pairs from the repository fixtures.
+
+    - tests/Finaltranslatable_flat.json segments are labelled with the page language (en)
+    - tests/Finaltranslations.json segments that differ from their source are French
+    - uploaded_files/*.html translatable text nodes are labelled with <html lang>
+    """
+    from bs4 import BeautifulSoup
+    from Finalstep1_extract import is_translatable_text
+
+    samples = []
+    tests_dir = os.path.join(BASE_DIR, "tests")
+    with open(os.path.join(tests_dir, "Finaltranslatable_flat.json"), "r", encoding="utf-8") as f:
+        source = json.load(f)
+    with open(os.path.join(tests_dir, "Finaltranslations.json"), "r", encoding="utf-8") as f:
+        translated = json.load(f)
+
+    for block_id, block in source.items():
+        target_segments = translated.get(block_id, {}).get("segments", {})
+        for seg_id, text in block.get("segments", {}).items():
+            samples.append((text, "en"))
+            target = target_segments.get(seg_id)
+            if target and target != text:
+                samples.append((target, "fr"))
+
+    upload_dir = os.path.join(BASE_DIR, "uploaded_files")
+    for filename in sorted(os.listdir(upload_dir)):
+        if not filename.endswith(".html"):
+            continue
+        with open(os.path.join(upload_dir, filename), "r", encoding="utf-8") as f:
+            soup = BeautifulSoup(f, "html5lib")
+        page_lang = (soup.html.get("lang") or "en").split("-")[0].lower()
+        for element in soup.find_all(string=True):
+            if is_translatable_text(element):
+                samples.append((element.strip(), page_lang))
+    return samples
+
+
+def run_benchmark(primary_lang="en", repeat=5):
+    from Finalstep1_extract import detectis_exception_language, classify_languages
+
+    samples = load_benchmark_samples()
+    texts = [text for text, _ in samples]
+    identifier = get_identifier()
+
+    candidates = {
+        "heuristics": (
+            lambda: [detectis_exception_language(text) for text in texts],
+        ),
+        "heuristics (batch)": (lambda: classify_languages(texts),),
+        "ngram": (lambda: [identifier.identify(text) for text in texts],),
+        "ngram (batch)": (lambda: identifier.identify_batch(texts),),
+    }
+
+    report = {"samples": len(samples), "primary_lang": primary_lang, "detectors": {}}
+    print(f"{len(samples)} labelled strings (undecided counts as --primary-lang {primary_lang})")
+    print(f"{'detector':<20} {'accuracy':>9} {'accuracy 4+ words':>18} {'strings/s':>12}")
+    for name, (detect,) in candidates.items():
+        start = time.perf_counter()
+        for _ in range(repeat):
+            predictions = detect()
+        elapsed = (time.perf_counter() - start) / repeat
+
+        correct = long_correct = long_total = 0
+        for (text, label), predicted in zip(samples, predictions):
+            hit = (predicted or primary_lang) == label
+            correct += hit
+            if len(text.split()) >= 4:
+                long_total += 1
+                long_correct += hit
+
+        accuracy = correct / len(samples) if samples else 0.0
+        long_accuracy = long_correct / long_total if long_total else 0.0
+        speed = len(samples) / elapsed if elapsed else float("inf")
+        report["detectors"][name] = {
+            "accuracy": round(accuracy, 4),
+            "accuracy_4_plus_words": round(long_accuracy, 4),
+            "strings_per_second": round(speed, 1)
+        }
+        print(f"{name:<20} {accuracy:>9.2%} {long_accuracy:>18.2%} {speed:>12,.0f}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Character n-gram language identifier.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Rebuild langid_profiles.json from <lang>.txt files")
+    build.add_argument("corpus_dir", nargs="?", help="Directory with one plain-text file per language")
+    build.add_argument("--langdetect", metavar="DIR", help="langdetect profiles directory to import instead")
+    build.add_argument("--output", "-o", default=PROFILE_FILE, help="Profile file to write")
+    build.add_argument("--size", type=int, default=PROFILE_SIZE, help="n-grams kept per language")
+
+    bench = commands.add_parser("benchmark", help="Compare accuracy and speed with the step 1 heuristics")
+    bench.add_argument("--primary-lang", default="en", help="Language assumed when a detector is undecided")
+    bench.add_argument("--repeat", type=int, default=5, help="Timing repetitions")
+    bench.add_argument("--report", help="Optional path for a JSON report")
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        if args.langdetect:
+            profiles = build_profiles_from_langdetect(args.langdetect, args.size)
+        elif args.corpus_dir:
+            profiles = build_profiles(args.corpus_dir, args.size)
+        else:
+            parser.error("build needs CORPUS_DIR or --langdetect DIR")
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(profiles, f, ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+        print(f"✅ Wrote {len(profiles)} profiles to {args.output}")
+    else:
+        report = run_benchmark(args.primary_lang, args.repeat)
+        if args.report:
+            with open(args.report, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+        sys.exit(0)
@@ -0,0 +1,107 @@
+"""
+Persistent segmentation cache for step 1.
+
+Maps hash(text, model fingerprint, language, granularity) to the structured
+sentence/word records of a block, stored as zlib-compressed compact JSON in a
+SQLite database. The database runs in WAL mode so parallel extraction
+processes can read and write the same file; entries are evicted least
+recently used first once the stored size exceeds the cap.
+"""
+import json
+import time
+import zlib
+import hashlib
+
+from sqlite_store import connect, select_in, write_many
+
+CACHE_FORMAT = 1            # bump when the record layout changes
+DEFAULT_MAX_MB = 256
+EVICT_TO = 0.9              # evict down to this share of the cap
+
+
+def cache_key(text, model_id, language, granularity):
+    payload = json.dumps([CACHE_FORMAT, model_id, language, granularity, text], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def pack_records(structured):
+    return zlib.compress(json.dumps(structured, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def unpack_records(blob):
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+class SegmentCache:
+    """Size-bounded LRU store of block records shared between processes."""
+
+    def __init__(self, path, max_mb=DEFAULT_MAX_MB):
+        self.path = path
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.db = connect(path, (
+            "CREATE TABLE IF NOT EXISTS segments ("
+            " key TEXT PRIMARY KEY, value BLOB NOT NULL,"
+            " size INTEGER NOT NULL, last_used REAL NOT NULL)",
+            "CREATE INDEX IF NOT EXISTS segments_last_used ON segments (last_used)",
+        ))
+
+    def get_many(self, keys):
+        """Return {key: structured} for the keys found; found entries are marked as used."""
+        keys = list(dict.fromkeys(keys))
+        found = {
+            key: unpack_records(value)
+            for key, value in select_in(self.db, "SELECT key, value FROM segments WHERE key IN ({marks})", keys)
+        }
+
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        if found:
+            now = time.time()
+            write_many(
+                self.db,
+                "UPDATE segments SET last_used = ? WHERE key = ?",
+                [(now, key) for key in found]
+            )
+        return found
+
+    def put_many(self, items):
+        """Store (key, structured) pairs, then evict old entries if the cap is exceeded."""
+        now = time.time()
+        rows = []
+        for key, structured in items:
+            blob = pack_records(structured)
+            rows.append((key, blob, len(blob), now))
+        if not rows:
+            return
+        write_many(self.db, "INSERT OR REPLACE INTO segments (key, value, size, last_used) VALUES (?, ?, ?, ?)", rows)
+        self.evict()
+
+    def evict(self):
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM segments").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = total - self.max_bytes * EVICT_TO
+        victims, freed = [], 0
+        for key, size in self.db.execute("SELECT key, size FROM segments ORDER BY last_used"):
+            victims.append((key,))
+            freed += size
+            if freed >= target:
+                break
+        write_many(self.db, "DELETE FROM segments WHERE key = ?", victims)
+        self.evictions += len(victims)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+    def close(self):
+        self.db.close()
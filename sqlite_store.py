@@ -0,0 +1,45 @@
+"""
+SQLite helpers shared by the step 1 segment cache and the step 2 translation memory.
+
+Databases run in WAL mode: any number of processes read while one writes,
+and writes are batched into one transaction per call.
+"""
+import sqlite3
+
+TIMEOUT = 30                # seconds a writer waits for the lock
+SQL_CHUNK = 500             # keys per IN (...) query
+
+
+def connect(path, schema=()):
+    """Open path in WAL mode and run the schema statements (CREATE ... IF NOT EXISTS)."""
+    db = sqlite3.connect(path, timeout=TIMEOUT, isolation_level=None)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    for statement in schema:
+        db.execute(statement)
+    return db
+
+
+def select_in(db, sql, keys, params=()):
+    """
+    Yield the rows of sql for all keys, SQL_CHUNK keys per query.
+
+    sql has a {marks} placeholder for the IN (...) list; params are bound
+    before the keys.
+    """
+    keys = list(keys)
+    for start in range(0, len(keys), SQL_CHUNK):
+        chunk = keys[start:start + SQL_CHUNK]
+        yield from db.execute(sql.format(marks=",".join("?" * len(chunk))), [*params, *chunk])
+
+
+def write_many(db, sql, rows):
+    """Run sql for every row in one transaction."""
+    # BEGIN IMMEDIATE takes the write lock up front; other processes wait up to the timeout
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        db.executemany(sql, rows)
+        db.execute("COMMIT")
+    except Exception:
+        db.execute("ROLLBACK")
+        raise
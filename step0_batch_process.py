@@ -3,19 +3,21 @@ import os
 import subprocess
 from pathlib import Path
 
+from Finalstep1_extract import extract_translatable, STRUCTURED_FILES
+
 UPLOAD_DIR = Path("upload_files")
 OUTPUT_DIR = Path("output")
 LANG_PRIMARY = "en"
 LANG_SECONDARY = "fr"
 TARGET_LANG = "FR"
 MEMORY_DIR = "translation_memory"
+STEP1_OUTPUTS = ("flat", "structured", "sentences", "html")
+STRUCTURED_FORMAT = "packed"  # step 2 reuses its language data (--structured)
 
-def run_step1(input_path):
-    subprocess.run([
-        "python", "Finalstep1_extract.py",
-        str(input_path),
-        "--lang", LANG_PRIMARY
-    ], check=True)
+def run_step1(input_path, output_path):
+    # In-process, so the spaCy models are loaded once for the whole batch
+    result = extract_translatable(Path(input_path), LANG_PRIMARY)
+    result.write(output_path, STEP1_OUTPUTS, structured_format=STRUCTURED_FORMAT)
 
 def run_step2(flat_json_path, output_path):
     subprocess.run([
@@ -27,20 +29,10 @@ def run_step2(flat_json_path, output_path):
         "--secondary-lang", LANG_SECONDARY,
         "--memory", MEMORY_DIR,
         "--apply",
-        "--segments", str(output_path / "segments.json")
+        "--segments", str(output_path / "segments.json"),
+        "--structured", str(output_path / STRUCTURED_FILES[STRUCTURED_FORMAT])
     ], check=True)
 
-def move_step1_outputs(output_path):
-    for filename in [
-        "translatable_flat.json",
-        "translatable_structured.json",
-        "translatable_flat_sentences.json",
-        "non_translatable.html"
-    ]:
-        src = Path(filename)
-        if src.exists():
-            src.rename(output_path / filename)
-
 def main():
     if not UPLOAD_DIR.exists():
         print(f"Upload folder {UPLOAD_DIR} not found.")
@@ -61,8 +53,7 @@ def main():
         output_path.mkdir(parents=True, exist_ok=True)
 
         # Step 1: Extract
-        run_step1(html_file)
-        move_step1_outputs(output_path)
+        run_step1(html_file, output_path)
 
         # Step 2: Translate
         flat_json_path = output_path / "translatable_flat.json"
@@ -0,0 +1,148 @@
+"""
+Per-phase wall time, call counts and peak memory for step 1 (--profile).
+
+Phases nest: time spent in an inner phase (e.g. pinyin inside nlp) is
+charged to the inner phase only, so the phase times add up to at most the
+total and "unaccounted" is the rest. Recursive calls of the same phase are
+counted once.
+
+The process-wide peak RSS is always reported where the resource module
+exists. The tracemalloc peak is opt-in (trace_memory): tracemalloc slows
+allocation-heavy code down by an order of magnitude, spaCy model loading
+most of all, so tracing starts once the page's models are loaded and a model
+loaded lazily afterwards (exception languages) inflates "model_loading".
+"""
+import sys
+import json
+import time
+import heapq
+import functools
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows: no peak RSS in the report
+    resource = None
+
+DEFAULT_TOP_BLOCKS = 20
+PREVIEW_CHARS = 80
+
+
+class PhaseProfiler:
+    """Accumulates exclusive time per phase plus the slowest blocks."""
+
+    def __init__(self, top_blocks=DEFAULT_TOP_BLOCKS, trace_memory=False):
+        self.top_blocks = top_blocks
+        self.trace_memory = trace_memory
+        self.phases = {}
+        self.counters = {}
+        self.slow_blocks = []      # min-heap of (seconds, order, entry)
+        self._stack = []           # [name, started, depth]
+        self._order = 0
+        self.started = time.perf_counter()
+
+    def start_memory_trace(self):
+        """Start tracemalloc (once); call after the expensive model loading."""
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def enter(self, name):
+        now = time.perf_counter()
+        if self._stack:
+            top = self._stack[-1]
+            if top[0] == name:
+                top[2] += 1
+                return
+            self._charge(top[0], now - top[1])
+        self._stack.append([name, now, 1])
+        self.phases.setdefault(name, {"seconds": 0.0, "calls": 0})["calls"] += 1
+
+    def exit(self, name):
+        now = time.perf_counter()
+        top = self._stack[-1]
+        if top[2] > 1:
+            top[2] -= 1
+            return
+        self._charge(name, now - top[1])
+        self._stack.pop()
+        if self._stack:
+            self._stack[-1][1] = now
+
+    def _charge(self, name, seconds):
+        self.phases[name]["seconds"] += seconds
+
+    @contextmanager
+    def phase(self, name):
+        self.enter(name)
+        try:
+            yield
+        finally:
+            self.exit(name)
+
+    def wrap(self, func, name):
+        """Return func timed as phase name."""
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            self.enter(name)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.exit(name)
+        return timed
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def record_block(self, block_id, text, seconds):
+        self._order += 1
+        entry = (seconds, self._order, {
+            "block_id": block_id,
+            "seconds": seconds,
+            "chars": len(text),
+            "text": text[:PREVIEW_CHARS],
+        })
+        if len(self.slow_blocks) < self.top_blocks:
+            heapq.heappush(self.slow_blocks, entry)
+        elif entry > self.slow_blocks[0]:
+            heapq.heapreplace(self.slow_blocks, entry)
+
+    def report(self, **context):
+        total = time.perf_counter() - self.started
+        accounted = sum(phase["seconds"] for phase in self.phases.values())
+        phases = {
+            name: {
+                "seconds": round(phase["seconds"], 6),
+                "calls": phase["calls"],
+                "share": round(phase["seconds"] / total, 4) if total else 0.0,
+            }
+            for name, phase in sorted(self.phases.items(), key=lambda item: -item[1]["seconds"])
+        }
+        report = {
+            **context,
+            "total_seconds": round(total, 6),
+            "unaccounted_seconds": round(max(total - accounted, 0.0), 6),
+            "phases": phases,
+            "counters": dict(sorted(self.counters.items())),
+            "slowest_blocks": [
+                {**entry, "seconds": round(entry["seconds"], 6)}
+                for _, _, entry in sorted(self.slow_blocks, reverse=True)
+            ],
+        }
+        memory = {}
+        if self.trace_memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            memory.update(traced_current_bytes=current, traced_peak_bytes=peak)
+        if resource is not None:
+            # ru_maxrss is in kilobytes on Linux, bytes on macOS
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            memory["max_rss_bytes"] = max_rss if sys.platform == "darwin" else max_rss * 1024
+        if memory:
+            report["memory"] = memory
+        return report
+
+    def write(self, path, **context):
+        report = self.report(**context)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        return report
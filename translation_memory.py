@@ -0,0 +1,202 @@
+"""
+SQLite translation memory for step 2.
+
+Entries are keyed by (source_lang, target_lang, source_hash) and keep the
+source text, so a hash collision can never return a wrong translation. The
+database is shared between processes, see sqlite_store.
+
+Entries migrated from the old translation_memory_{lang}.json files have an
+unknown source language (source_lang ""); lookups fall back to them when no
+entry for the detected source language exists.
+
+The same database keeps the source languages DeepL detected (--remote-detect),
+keyed by text hash, so a text is only sent for detection once.
+
+Usage:
+    python translation_memory.py migrate [translation_memory]   # import the JSON files once
+    python translation_memory.py stats [translation_memory]
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+
+from sqlite_store import connect, select_in, write_many
+
+DB_FILE = "translation_memory.sqlite3"
+JSON_PATTERN = ("translation_memory_", ".json")   # translation_memory_{lang}.json
+MIGRATED_SUFFIX = ".migrated"
+UNKNOWN_SOURCE = ""          # source_lang of migrated entries
+
+
+def source_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class TranslationMemory:
+    """Translations shared between runs and processes, looked up per batch."""
+
+    def __init__(self, path):
+        self.path = path
+        self.db = connect(path, (
+            "CREATE TABLE IF NOT EXISTS translations ("
+            " source_lang TEXT NOT NULL, target_lang TEXT NOT NULL, source_hash TEXT NOT NULL,"
+            " source_text TEXT NOT NULL, translation TEXT NOT NULL, updated REAL NOT NULL,"
+            " PRIMARY KEY (source_lang, target_lang, source_hash))",
+            "CREATE INDEX IF NOT EXISTS translations_lookup ON translations (target_lang, source_hash)",
+            "CREATE TABLE IF NOT EXISTS detections ("
+            " source_hash TEXT PRIMARY KEY, source_text TEXT NOT NULL,"
+            " language TEXT NOT NULL, updated REAL NOT NULL)",
+        ))
+
+    def get_many(self, target_lang, entries):
+        """
+        Look up (source_lang, text) pairs; returns {(source_lang, text): translation} for the hits.
+
+        An entry with the exact source language wins over a migrated one.
+        """
+        target_lang = target_lang.lower()
+        wanted = {}
+        for source_lang, text in entries:
+            wanted.setdefault(source_hash(text), []).append(((source_lang or UNKNOWN_SOURCE).lower(), text))
+
+        found = {}
+        rows = select_in(
+            self.db,
+            "SELECT source_lang, source_hash, source_text, translation FROM translations"
+            " WHERE target_lang = ? AND source_hash IN ({marks})",
+            wanted, (target_lang,)
+        )
+        for source_lang, digest, source_text, translation in rows:
+            for wanted_lang, text in wanted[digest]:
+                if text != source_text or source_lang not in (wanted_lang, UNKNOWN_SOURCE):
+                    continue
+                if source_lang == UNKNOWN_SOURCE and translation == text:
+                    continue  # untranslated text migrated before migrate_json skipped it
+                key = (wanted_lang, text)
+                if source_lang == wanted_lang or key not in found:
+                    found[key] = translation
+        return found
+
+    def put_many(self, target_lang, rows):
+        """Store (source_lang, text, translation) rows in one transaction."""
+        target_lang = target_lang.lower()
+        now = time.time()
+        values = [
+            ((source_lang or UNKNOWN_SOURCE).lower(), target_lang, source_hash(text), text, translation, now)
+            for source_lang, text, translation in rows
+        ]
+        if not values:
+            return
+        write_many(
+            self.db,
+            "INSERT OR REPLACE INTO translations"
+            " (source_lang, target_lang, source_hash, source_text, translation, updated)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            values
+        )
+
+    def get_languages(self, texts):
+        """Return {text: language} for the texts with a stored detection."""
+        wanted = {source_hash(text): text for text in texts}
+        rows = select_in(
+            self.db,
+            "SELECT source_hash, source_text, language FROM detections WHERE source_hash IN ({marks})",
+            wanted
+        )
+        return {
+            source_text: language
+            for digest, source_text, language in rows
+            if wanted[digest] == source_text
+        }
+
+    def put_languages(self, detections):
+        """Store (text, language) pairs in one transaction."""
+        now = time.time()
+        values = [(source_hash(text), text, language.lower(), now) for text, language in detections]
+        if not values:
+            return
+        write_many(
+            self.db,
+            "INSERT OR REPLACE INTO detections (source_hash, source_text, language, updated)"
+            " VALUES (?, ?, ?, ?)",
+            values
+        )
+
+    def migrate_json(self, json_path, target_lang):
+        """
+        Import an old translation_memory_{lang}.json file once.
+
+        Entries whose translation is the source text itself are skipped: older
+        runs stored the untranslated text for skipped or failed batches. The
+        file is renamed to *.migrated afterwards; returns the number of
+        entries imported and skipped.
+        """
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                memory = json.load(f)
+        except FileNotFoundError:  # another process migrated it first
+            return 0, 0
+        except json.JSONDecodeError:
+            print(f"Warning: Corrupted translation memory file {json_path}, not migrated")
+            return 0, 0
+
+        rows = [(UNKNOWN_SOURCE, text, translation) for text, translation in memory.items() if translation != text]
+        self.put_many(target_lang, rows)
+        try:
+            os.replace(json_path, json_path + MIGRATED_SUFFIX)
+        except FileNotFoundError:
+            pass
+        return len(rows), len(memory) - len(rows)
+
+    def stats(self):
+        """Entry counts per (source_lang, target_lang), plus the stored detections."""
+        stats = {
+            f"{source_lang or '?'}->{target_lang}": count
+            for source_lang, target_lang, count in self.db.execute(
+                "SELECT source_lang, target_lang, COUNT(*) FROM translations"
+                " GROUP BY source_lang, target_lang ORDER BY target_lang, source_lang"
+            )
+        }
+        stats["detected"] = self.db.execute("SELECT COUNT(*) FROM detections").fetchone()[0]
+        return stats
+
+    def close(self):
+        self.db.close()
+
+
+def json_memory_files(memory_dir):
+    """Yield (path, target_lang) for the old JSON memory files in memory_dir."""
+    prefix, suffix = JSON_PATTERN
+    for filename in sorted(os.listdir(memory_dir)):
+        if filename.startswith(prefix) and filename.endswith(suffix):
+            yield os.path.join(memory_dir, filename), filename[len(prefix):-len(suffix)]
+
+
+def open_memory(memory_dir):
+    """Open the memory in memory_dir, migrating any JSON files left from older runs."""
+    os.makedirs(memory_dir, exist_ok=True)
+    memory = TranslationMemory(os.path.join(memory_dir, DB_FILE))
+    for json_path, target_lang in json_memory_files(memory_dir):
+        count, skipped = memory.migrate_json(json_path, target_lang)
+        if count or skipped:
+            print(f"Migrated {count} cached translations from {json_path} "
+                  f"({skipped} untranslated entries skipped)")
+    return memory
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SQLite translation memory for step 2.")
+    parser.add_argument("command", choices=("migrate", "stats"))
+    parser.add_argument("memory_dir", nargs="?", default="translation_memory", help="Translation memory directory")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.memory_dir):
+        print(f"❌ Error: {args.memory_dir} is not a directory")
+        sys.exit(1)
+    memory = open_memory(args.memory_dir)
+    for pair, count in memory.stats().items():
+        print(f"{pair:<10} {count:>8,}")
+    memory.close()